@@ -0,0 +1,99 @@
+"""
+Ordonnancement des traitements par pays lancés en parallèle (spatial_analysis/scripts/run_world.py).
+Les boucles séries (health_score/1_build_score.py, voltage_analysis/tool_extract_voltage.py) restent
+dans l'ordre de WORLD_COUNTRY_DICT : l'ordre n'y change pas la durée totale.
+
+Le coût de chaque pays est estimé à partir des durées des runs précédents quand elles existent,
+sinon à partir de la taille de ses fichiers d'entrée (ou d'un nombre de pixels), convertie en
+secondes avec le ratio médian observé sur les pays déjà mesurés. Les pays sont lancés du plus long
+au plus court, pour que RU, CA ou US ne démarrent pas en dernier. Le modèle de coût (durée et
+mémoire de pointe par pays) est conservé dans un fichier JSON entre deux runs.
+
+Les scripts des sous-dossiers l'importent en ajoutant la racine du dépôt au sys.path.
+"""
+
+import json
+import statistics
+from pathlib import Path
+
+
+class CountryScheduler:
+    """Modèle de coût persistant et ordre de lancement des pays.
+
+    cost_file : fichier JSON du modèle de coût (créé au premier save)
+    memory_cap_mb : mémoire totale à ne pas dépasser par les jobs lancés simultanément (None = pas de plafond)
+    """
+
+    def __init__(self, cost_file, memory_cap_mb=None, default_memory_mb=1000.0):
+        self.cost_file = Path(cost_file)
+        self.memory_cap_mb = memory_cap_mb
+        self.default_memory_mb = default_memory_mb
+        self.model = {}
+        if self.cost_file.is_file():
+            with open(self.cost_file, encoding="utf-8") as f:
+                self.model = json.load(f)
+        self.sizes = {}
+
+    def set_size(self, country_code, size):
+        """Taille du pays (octets des fichiers d'entrée, pixels...), utilisée sans historique."""
+        self.sizes[country_code] = float(size)
+
+    def set_input_files(self, country_code, paths):
+        self.set_size(country_code, sum(Path(p).stat().st_size for p in paths if Path(p).exists()))
+
+    def _ratio(self, key):
+        """Ratio médian key / taille observé sur les pays déjà mesurés."""
+        ratios = [entry[key] / entry["size"] for entry in self.model.values()
+                  if entry.get(key) and entry.get("size")]
+        return statistics.median(ratios) if ratios else None
+
+    def estimate_duration(self, country_code):
+        entry = self.model.get(country_code, {})
+        if entry.get("duration_s") is not None:
+            return entry["duration_s"]
+        size = self.sizes.get(country_code, entry.get("size", 0.0))
+        ratio = self._ratio("duration_s")
+        return size * ratio if ratio else size
+
+    def estimate_memory(self, country_code):
+        entry = self.model.get(country_code, {})
+        if entry.get("peak_memory_mb"):
+            return entry["peak_memory_mb"]
+        ratio = self._ratio("peak_memory_mb")
+        size = self.sizes.get(country_code, entry.get("size"))
+        if ratio and size:
+            return size * ratio
+        return self.default_memory_mb
+
+    def order(self, country_codes):
+        """Pays triés du plus coûteux au moins coûteux."""
+        return sorted(country_codes, key=self.estimate_duration, reverse=True)
+
+    def next_job(self, pending, running_memory_mb=0.0):
+        """Prochain pays à lancer parmi pending (déjà trié par order) sans dépasser le plafond mémoire.
+
+        Retourne None si aucun job ne tient dans la mémoire restante ; quand rien ne tourne, le plus
+        long est lancé quoi qu'il arrive pour ne pas bloquer la file.
+        """
+        if not pending:
+            return None
+        if self.memory_cap_mb is None or running_memory_mb == 0:
+            return pending[0]
+        available = self.memory_cap_mb - running_memory_mb
+        for country_code in pending:
+            if self.estimate_memory(country_code) <= available:
+                return country_code
+        return None
+
+    def record(self, country_code, duration_s, peak_memory_mb=None):
+        entry = self.model.setdefault(country_code, {})
+        entry["duration_s"] = round(duration_s, 2)
+        if peak_memory_mb is not None:
+            entry["peak_memory_mb"] = round(peak_memory_mb, 1)
+        if country_code in self.sizes:
+            entry["size"] = self.sizes[country_code]
+
+    def save(self):
+        self.cost_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cost_file, "w", encoding="utf-8") as f:
+            json.dump(self.model, f, ensure_ascii=False, indent=4, sort_keys=True)
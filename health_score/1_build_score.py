@@ -1,102 +1,63 @@
 import geopandas as gpd
 import pandas as pd
-import networkx as nx
 import json
 import pprint
+from pathlib import Path
 from config import WORLD_COUNTRY_DICT
+from graph_engine import connectivity_stats, load_power_graph, voltage_connectivity
+from grid_fragility import bridges_and_articulations, fragility_stats, save_critical_lines
 
 SHOW_SMALL_GRAPHSET = True
 
 COUNTRY_CODE = "CO"
 DATA_FOLDER = "data"
 DATA_FOLDER = "/home/ben/DevProjects/osm-power-grid-map-analysis/data"
+GRAPH_SNAPSHOT_FOLDER = "build/graph_snapshots"
 
 
 def connectivity_analysis(graph):
-    stats = {}
-    list_graph_subsets = list(nx.connected_components(graph))
-    graph_stats = []
-    try:
-        for l in list_graph_subsets:
-            nbsub = len(
-                [n for n in l if (graph.nodes[n]["grid_role"] == "substation") and (graph.nodes[n]["status"] != "disconnected")])
-            nbseg = len([e for e in graph.subgraph(l).edges if graph.edges[e]["status"] != "disconnected"])
-            if nbsub:
-                graph_stats.append({"nbsub": nbsub, "nbseg": nbseg})
-            """if nbsub<10 and nbsub and SHOW_SMALL_GRAPHSET:
-                print(f"-- SECTION {nbsub} x {nbseg} :")
-                [print(n, end=" | ") for n in l if
-                 (graph.nodes[n]["grid_role"] == "substation") and (graph.nodes[n]["status"] != "disconnected")]
-                print()"""
-    except Exception:
-        stats["substation_connectivity"] = -1
-        stats["substation_connectivity_pct"] = -1
-        return stats
-
-    df_stat = pd.DataFrame(graph_stats)
-    # stats["substation_connectivity_pct"] = "{:.1f}".format((max(df_stat["nbsub"]) / sum(df_stat["nbsub"]))*100)
-
-    ## ANALYSIS OF GRID CONNECTIVITY
-    if len(df_stat) == 0:
-        stats["substation_connectivity"] = 0
-        stats["substation_connectivity_pct"] = 0
-    else:
-        df_stat = df_stat.sort_values(["nbsub", "nbseg"], ascending=False)
-        # Compute substation connectivity
-        cumsum = 0
-        for i, row in enumerate(df_stat.to_dict(orient='records')):
-            cumsum += row["nbsub"] / (i + 1)
-        stats["substation_connectivity_pct"] = cumsum / sum(df_stat["nbsub"])
-
-        df_stat_text = df_stat["nbsub"].astype(str) + "x" + df_stat["nbseg"].astype(str)
-        counts = df_stat_text.value_counts()
-        stats["substation_connectivity"] = " + ".join(
-            [f"{counts[subseg]}^({subseg})" if counts[subseg] != 1 else f"{subseg}"
-             for subseg in df_stat_text.unique().tolist()])
-    # print(counts)
-    # stats["grid_connectivity"] = " + ". join(f"{x['nbsub']}x{x['nbseg']}" for x in df_stat.to_dict(orient='records'))
-
-    #print("  -- Substation connectivity = ", stats["substation_connectivity"])
-    #print("  -- Substation connectivity % = ", stats["substation_connectivity_pct"], "%")
-    return stats
+    if graph.nb_missing_nodes:
+        # line endpoints absent from the node table have no grid_role / status
+        return {"substation_connectivity": -1, "substation_connectivity_pct": -1}
+    return connectivity_stats(*graph.component_counts())
+
+def load_graph(country_code, suffix):
+    """post_graph nodes / lines graph of a country, from its snapshot in build/graph_snapshots/ when up to date."""
+    return load_power_graph(f"{DATA_FOLDER}/{country_code}/post_graph_power_nodes{suffix}.gpkg",
+                            f"{DATA_FOLDER}/{country_code}/post_graph_power_lines{suffix}.gpkg",
+                            Path(f"{GRAPH_SNAPSHOT_FOLDER}/{country_code}/graph{suffix or '_lines'}"))
 
 def main(country_code):
-    df_power_line = gpd.read_file(f"{DATA_FOLDER}/{country_code}/osm_brut_power_line.gpkg")
-    df_power_tower = gpd.read_file(f"{DATA_FOLDER}/{country_code}/osm_brut_power_tower_transition.gpkg")
-    df_power_substation = gpd.read_file(f"{DATA_FOLDER}/{country_code}/osm_clean_power_substation.gpkg")
-    df_pregraph_power_nodes = gpd.read_file(f"{DATA_FOLDER}/{country_code}/pre_graph_power_nodes.gpkg")
-    df_pregraph_power_lines = gpd.read_file(f"{DATA_FOLDER}/{country_code}/pre_graph_power_lines.gpkg")
-    gdf_postgraph_nodes = gpd.read_file(f"{DATA_FOLDER}/{country_code}/post_graph_power_nodes.gpkg")
-    gdf_postgraph_lines = gpd.read_file(f"{DATA_FOLDER}/{country_code}/post_graph_power_lines.gpkg")
-
-    gdf_postgraph_lines_circuit = gpd.read_file(f"{DATA_FOLDER}/{country_code}/post_graph_power_lines_circuit.gpkg")
-    gdf_postgraph_nodes_circuit = gpd.read_file(f"{DATA_FOLDER}/{country_code}/post_graph_power_nodes_circuit.gpkg")
-
-    G = nx.MultiGraph()
-    gdf_postgraph_nodes.apply(lambda node: G.add_node(node["osmid"], grid_role=node["grid_role"],
-                                            status=node["status"]), axis=1)
-    gdf_postgraph_lines.apply(lambda line: G.add_edge(line["node0"], line["node1"], status= line["status"],
-                                            osmid=line["osmid"]), axis=1)
-
-    Gcircuit = nx.MultiGraph()
-    gdf_postgraph_nodes_circuit.apply(lambda node: Gcircuit.add_node(node["osmid"], grid_role=node["grid_role"],
-                                            status=node["status"]), axis=1)
-    gdf_postgraph_lines_circuit.apply(lambda line: Gcircuit.add_edge(line["node0"], line["node1"], status= line["status"],
-                                            osmid=line["osmid"]), axis=1)
-    if not len(gdf_postgraph_lines):
+    # geometries are never used: only the needed attribute columns are read
+    df_power_line = gpd.read_file(f"{DATA_FOLDER}/{country_code}/osm_brut_power_line.gpkg",
+                                  columns=["osmid", "power", "voltage", "cables"], ignore_geometry=True)
+    df_power_tower = gpd.read_file(f"{DATA_FOLDER}/{country_code}/osm_brut_power_tower_transition.gpkg",
+                                   columns=["power"], ignore_geometry=True)
+    df_power_substation = gpd.read_file(f"{DATA_FOLDER}/{country_code}/osm_clean_power_substation.gpkg",
+                                        columns=["voltage"], ignore_geometry=True)
+    df_pregraph_power_nodes = gpd.read_file(f"{DATA_FOLDER}/{country_code}/pre_graph_power_nodes.gpkg",
+                                            columns=["grid_role"], ignore_geometry=True)
+
+    G = load_graph(country_code, "")
+    Gcircuit = load_graph(country_code, "_circuit")
+    if not G.nb_edges:
         return
 
     mystat_classic = connectivity_analysis(G)
     mystat_circuit = connectivity_analysis(Gcircuit)
 
+    # connectivity per voltage level, voltages of the OSM power lines
+    voltage_connectivity(G, df_power_line["osmid"], df_power_line["voltage"]) \
+        .to_csv(f"build/voltage_connectivity_{country_code}.csv", index=False)
+
+    # N-1 fragility: bridges and articulation substations, critical lines saved for the map
+    fragility = bridges_and_articulations(G)
+    mystat_fragility = fragility_stats(G, fragility)
+    save_critical_lines(G, fragility, f"{DATA_FOLDER}/{country_code}/post_graph_power_lines.gpkg",
+                        f"build/critical_lines_{country_code}.gpkg")
+
     # count nb connection substation <-> line
-    nb_conn_line_sub = 0
-    for node in G.nodes:
-        mynode = G.nodes[node]
-        if mynode["grid_role"] == "substation":
-            nb_conn_line_sub += G.degree[node]
-        else:
-            pass
+    nb_conn_line_sub = int(G.degree()[G.role_mask("substation")].sum())
 
 
     with open(f"build/osmose_{country_code}.json") as f:
@@ -114,7 +75,7 @@ def main(country_code):
 
     key = "health_power_line_connectivity"
     names[key] = "Line connectivity"
-    indicators[key] = len(gdf_postgraph_lines[gdf_postgraph_lines["status"] == "connected"]) / len(gdf_postgraph_lines)
+    indicators[key] = int(G.status_mask(G.edge_status, "connected").sum()) / G.nb_edges
     explanations[key] = "nb(Grid connected power line|cable) / nb(Grid power line|cable) || Grid line derivated (~=) from OSM power=line|cable after connectivity analysis"
 
     key = "health_grid_connectivity_without_circuit"
@@ -179,14 +140,34 @@ def main(country_code):
 
     key = "stats_nb_international_connections"
     names[key] = "Number of international connection"
-    indicators[key] = len([n for n in G.nodes if G.nodes[n]["grid_role"] == "international"])
+    indicators[key] = int(G.role_mask("international").sum())
     explanations[key] = "..."
 
     key = "stats_nb_substations"
     names[key] = "Number of substations"
-    indicators[key] = len([n for n in G.nodes if G.nodes[n]["grid_role"] == "substation"])
+    indicators[key] = int(G.role_mask("substation").sum())
     explanations[key] = "..."
 
+    key = "stats_nb_critical_lines"
+    names[key] = "Number of critical lines"
+    indicators[key] = mystat_fragility["nb_critical_bridges"]
+    explanations[key] = "nb(Grid line whose loss splits substations apart) | bridges of the grid graph, saved in critical_lines_<country>.gpkg"
+
+    key = "stats_nb_bridge_lines"
+    names[key] = "Number of bridge lines"
+    indicators[key] = mystat_fragility["nb_bridges"]
+    explanations[key] = "nb(Grid line whose loss splits its grid component)"
+
+    key = "stats_nb_articulation_substations"
+    names[key] = "Number of articulation substations"
+    indicators[key] = mystat_fragility["nb_articulation_substations"]
+    explanations[key] = "nb(Substation whose loss splits its grid component)"
+
+    key = "stats_nb_critical_articulation_substations"
+    names[key] = "Number of critical articulation substations"
+    indicators[key] = mystat_fragility["nb_critical_articulation_substations"]
+    explanations[key] = "nb(Substation whose loss splits other substations apart)"
+
     key = "stats_line_voltages"
     names[key] = "Lines voltages"
     indicators[key] = df_power_line["voltage"].unique().tolist()
@@ -0,0 +1,543 @@
+"""
+Graphe électrique d'un pays sous forme de tableaux NumPy, pour 1_build_score.py.
+
+Remplace les nx.MultiGraph construits ligne à ligne : les osmid des nœuds et les extrémités
+node0/node1 des lignes sont factorisés en identifiants entiers, les rôles et statuts sont stockés
+en codes catégoriels et l'adjacence est une CSR (indptr, voisin, indice de la ligne). Les
+composantes connexes viennent de scipy.sparse.csgraph et les comptes par composante (substations
+et segments actifs) sont des bincount sur les étiquettes de composante.
+
+Le graphe de chaque pays est conservé en instantané (load_power_graph) : un dossier de fichiers
+.npy (identifiants, codes, extrémités, CSR) et un meta.json avec les catégories et la taille / date
+des GeoPackages sources. Les tableaux sont ouverts en mmap ; l'instantané est reconstruit dès qu'un
+des fichiers sources a changé.
+
+L'instantané garde aussi la connectivité : un union-find compressé (racine de la composante de
+chaque nœud), les comptes de substations et de segments actifs par racine et la table osmid ->
+nœud. Un pays dont les sources n'ont pas changé est relu sans recalcul. Quand elles changent
+(nouvel extrait OSM), incremental_connectivity part de l'instantané précédent : les lignes sont
+comparées à son ensemble de lignes, les ajouts sont réunis directement dans son union-find, seules
+les composantes touchées par une suppression sont réétiquetées et les comptes sont corrigés
+composante par composante. La lecture du GeoPackage, la construction du graphe et la comparaison
+des lignes (un tri) restent linéaires ; une suppression dans la composante principale la
+réétiquette entière.
+
+Mêmes conventions que le MultiGraph d'origine : plusieurs lignes entre deux nœuds sont autant
+d'arêtes, une boucle compte deux fois dans le degré, une extrémité absente de la table des nœuds
+(ou vide) est un nœud sans attributs ; s'il y en a, connectivity_analysis renvoie -1 comme avant.
+"""
+
+import json
+import shutil
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+class PowerGraph:
+    """Multigraphe non orienté : nœuds 0..nb_nodes-1, arêtes (edge_u[i], edge_v[i]).
+
+    node_osmid : osmid de chaque nœud (les nœuds sans attributs sont en fin de tableau)
+    node_role, node_status, edge_status : codes dans roles / statuses (-1 = valeur absente)
+    nb_missing_nodes : nombre d'extrémités de lignes absentes de la table des nœuds
+    node_fid, edge_fid : ligne de chaque nœud / arête dans son GeoPackage (index des tables, -1 = sans ligne)
+    """
+
+    def __init__(self, node_osmid, node_role, node_status, roles, statuses, edge_u, edge_v, edge_status,
+                 edge_osmid, nb_missing_nodes=0, node_fid=None, edge_fid=None):
+        self.node_osmid = node_osmid
+        self.node_role = node_role
+        self.node_status = node_status
+        self.roles = list(roles)
+        self.statuses = list(statuses)
+        self.edge_u = edge_u
+        self.edge_v = edge_v
+        self.edge_status = edge_status
+        self.edge_osmid = edge_osmid
+        self.nb_missing_nodes = int(nb_missing_nodes)
+        self.node_fid = np.full(len(node_osmid), -1, dtype=np.int64) if node_fid is None else node_fid
+        self.edge_fid = np.arange(len(edge_u), dtype=np.int64) if edge_fid is None else edge_fid
+        self._csr = None
+        self._labels = None
+        self._connectivity = None
+        self._osmid_index = None
+
+    @classmethod
+    def from_frames(cls, nodes, lines):
+        """Graphe à partir des tables post_graph_power_nodes / post_graph_power_lines (géométrie ignorée).
+
+        L'index des tables est conservé comme fid (load_power_graph les lit avec fid_as_index).
+        """
+        # un osmid répété dans la table des nœuds garde les attributs de sa dernière ligne
+        nodes = nodes[nodes["osmid"].isna() | ~nodes["osmid"].duplicated(keep="last")]
+        node_osmid, uniques = pd.factorize(pd.concat([nodes["osmid"], lines["node0"], lines["node1"]],
+                                                     ignore_index=True))
+        # un osmid vide (NaN) est un nœud à part à chaque occurrence, comme dans le MultiGraph
+        empty = np.flatnonzero(node_osmid < 0)
+        node_osmid[empty] = len(uniques) + np.arange(len(empty))
+        nb_nodes = len(uniques) + len(empty)
+        nb_known = len(nodes)
+        nb_lines = len(lines)
+        edge_u = node_osmid[nb_known:nb_known + nb_lines]
+        edge_v = node_osmid[nb_known + nb_lines:]
+
+        roles = pd.Categorical(nodes["grid_role"])
+        statuses = pd.Categorical(pd.concat([nodes["status"], lines["status"]], ignore_index=True))
+        node_role = np.full(nb_nodes, -1, dtype=np.int16)
+        node_status = np.full(nb_nodes, -1, dtype=np.int16)
+        node_role[node_osmid[:nb_known]] = roles.codes
+        node_status[node_osmid[:nb_known]] = statuses.codes[:nb_known]
+        has_attributes = np.zeros(nb_nodes, dtype=bool)
+        has_attributes[node_osmid[:nb_known]] = True
+        node_fid = np.full(nb_nodes, -1, dtype=np.int64)
+        node_fid[node_osmid[:nb_known]] = nodes.index.to_numpy()
+
+        osmids = np.asarray(uniques) if not len(empty) else \
+            np.concatenate((np.asarray(uniques, dtype=object), np.full(len(empty), None, dtype=object)))
+        # nœuds connus d'abord, nœuds sans attributs ensuite
+        order = np.argsort(~has_attributes, kind="stable")
+        new_id = np.empty(nb_nodes, dtype=np.int64)
+        new_id[order] = np.arange(nb_nodes)
+        return cls(osmids[order], node_role[order], node_status[order], roles.categories, statuses.categories,
+                   new_id[edge_u], new_id[edge_v], statuses.codes[nb_known:].astype(np.int16),
+                   lines["osmid"].to_numpy(), nb_missing_nodes=nb_nodes - int(has_attributes.sum()),
+                   node_fid=node_fid[order], edge_fid=lines.index.to_numpy(dtype=np.int64))
+
+    @property
+    def nb_nodes(self):
+        return len(self.node_osmid)
+
+    @property
+    def nb_edges(self):
+        return len(self.edge_u)
+
+    def role_mask(self, role):
+        return self.node_role == self.roles.index(role) if role in self.roles else np.zeros(self.nb_nodes, dtype=bool)
+
+    def status_mask(self, codes, status):
+        return codes == self.statuses.index(status) if status in self.statuses else np.zeros(len(codes), dtype=bool)
+
+    def active_substations(self):
+        """Nœuds substation non déconnectés."""
+        return self.role_mask("substation") & ~self.status_mask(self.node_status, "disconnected")
+
+    def active_segments(self):
+        """Lignes non déconnectées."""
+        return ~self.status_mask(self.edge_status, "disconnected")
+
+    def osmid_index(self):
+        """Table osmid -> nœud : (osmid triés, nœud de chacun) ; les nœuds sans osmid n'y sont pas."""
+        if self._osmid_index is None:
+            osmid = osmid_array(self.node_osmid)
+            if osmid.dtype.kind in "iu":
+                named = np.arange(len(osmid))
+            elif osmid.dtype.kind == "f":
+                named = np.flatnonzero(~np.isnan(osmid))
+            else:
+                named = np.flatnonzero((osmid != "None") & (osmid != "nan"))
+            order = named[np.argsort(osmid[named], kind="stable")]
+            self._osmid_index = osmid[order], order
+        return self._osmid_index
+
+    def degree(self):
+        """Degré de chaque nœud (une boucle compte deux fois, comme nx.MultiGraph.degree)."""
+        return np.bincount(np.concatenate((self.edge_u, self.edge_v)), minlength=self.nb_nodes)
+
+    def csr(self):
+        """Adjacence CSR (indptr, voisins, indices des lignes) : les voisins de n sont neighbors[indptr[n]:indptr[n + 1]]."""
+        if self._csr is None:
+            ends = np.concatenate((self.edge_u, self.edge_v))
+            others = np.concatenate((self.edge_v, self.edge_u))
+            edge_ids = np.tile(np.arange(self.nb_edges), 2)
+            order = np.argsort(ends, kind="stable")
+            indptr = np.zeros(self.nb_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(ends, minlength=self.nb_nodes), out=indptr[1:])
+            self._csr = indptr, others[order], edge_ids[order]
+        return self._csr
+
+    def components(self):
+        """Étiquette de composante connexe de chaque nœud."""
+        if self._labels is None and self._connectivity is not None:
+            self._labels = pd.factorize(np.asarray(self._connectivity[0]))[0]
+        if self._labels is None:
+            indptr, neighbors, _ = self.csr()
+            adjacency = csr_matrix((np.ones(len(neighbors), dtype=np.int8), neighbors, indptr),
+                                   shape=(self.nb_nodes, self.nb_nodes))
+            _, self._labels = connected_components(adjacency, directed=False)
+        return self._labels
+
+    def connectivity(self):
+        """(parent, nbsub, nbseg) : union-find compressé et comptes de chaque composante.
+
+        parent[n] est la racine de la composante de n (un de ses nœuds) ; nbsub / nbseg sont
+        indexés par nœud et valent, pour une racine, les substations et segments actifs de sa
+        composante, 0 ailleurs. Relu de l'instantané ou mis à jour par incremental_connectivity.
+        """
+        if self._connectivity is None:
+            labels = self.components()
+            parent = component_roots(labels)[labels]
+            self._connectivity = (parent, np.bincount(parent[self.active_substations()], minlength=self.nb_nodes),
+                                  np.bincount(parent[self.edge_u[self.active_segments()]], minlength=self.nb_nodes))
+        return self._connectivity
+
+    def component_counts(self, labels=None):
+        """(substations non déconnectées, segments non déconnectés) de chaque composante.
+
+        Sans labels, les comptes par racine de connectivity : une entrée nulle par nœud non racine.
+        """
+        if labels is None:
+            _, nbsub, nbseg = self.connectivity()
+            return np.asarray(nbsub), np.asarray(nbseg)
+        nb_components = int(labels.max()) + 1 if len(labels) else 0
+        nbsub = np.bincount(labels[self.active_substations()], minlength=nb_components)
+        nbseg = np.bincount(labels[self.edge_u[self.active_segments()]], minlength=nb_components)
+        return nbsub, nbseg
+
+
+SNAPSHOT_ARRAYS = ("node_osmid", "node_role", "node_status", "node_fid", "edge_u", "edge_v", "edge_status",
+                   "edge_osmid", "edge_fid")
+SNAPSHOT_CSR_ARRAYS = ("indptr", "neighbors", "edge_ids")
+SNAPSHOT_CONNECTIVITY_ARRAYS = ("parent", "component_nbsub", "component_nbseg")
+SNAPSHOT_OSMID_ARRAYS = ("osmid_sorted", "osmid_node")
+
+
+def osmid_array(values):
+    """Identifiants OSM en tableau natif : entiers si possible, chaînes de longueur fixe sinon (mmap possible)."""
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = pd.Series(values).infer_objects().to_numpy()
+        if values.dtype == object:
+            values = values.astype(str)
+    return values
+
+
+def same_kind(left, right):
+    """Deux tableaux d'identifiants comparables : en chaînes si l'un est numérique et l'autre non."""
+    if left.dtype.kind != right.dtype.kind:
+        return left.astype(str), right.astype(str)
+    return left, right
+
+
+def osmid_lookup(osmid_sorted, osmid_node, values):
+    """Nœud de chaque osmid de values dans une table osmid_index (-1 si absent)."""
+    values = osmid_array(values)
+    if osmid_sorted.dtype.kind != values.dtype.kind and not (osmid_sorted.dtype.kind in "iuf"
+                                                             and values.dtype.kind in "iuf"):
+        osmid_sorted, values = osmid_sorted.astype(str), values.astype(str)
+        order = np.argsort(osmid_sorted, kind="stable")
+        osmid_sorted, osmid_node = osmid_sorted[order], np.asarray(osmid_node)[order]
+    if not len(osmid_sorted):
+        return np.full(len(values), -1, dtype=np.int64)
+    position = np.minimum(np.searchsorted(osmid_sorted, values), len(osmid_sorted) - 1)
+    return np.where(osmid_sorted[position] == values, np.asarray(osmid_node)[position], -1)
+
+
+def component_roots(labels):
+    """Indice du premier élément de chaque étiquette (labels de 0 à k-1)."""
+    first = np.full(int(labels.max()) + 1 if len(labels) else 0, len(labels), dtype=np.int64)
+    np.minimum.at(first, labels, np.arange(len(labels)))
+    return first
+
+
+def find(parent, nodes):
+    """Racines des nœuds dans l'union-find parent."""
+    roots = parent[nodes]
+    while True:
+        up = parent[roots]
+        if np.array_equal(up, roots):
+            return roots
+        roots = up
+
+
+def edge_diff(old_keys, new_keys):
+    """Indices des clés supprimées (dans old_keys) et ajoutées (dans new_keys), comptées en multiensemble.
+
+    Clés entières positives < 2**62 ; un seul tri des valeurs. Parmi des clés égales, les premières
+    occurrences sont retenues.
+    """
+    both = np.concatenate((np.asarray(old_keys, dtype=np.int64) * 2, np.asarray(new_keys, dtype=np.int64) * 2 + 1))
+    both.sort()
+    keys = both >> 1
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    nb_new = np.add.reduceat(both & 1, starts) if len(both) else np.zeros(0, dtype=np.int64)
+    surplus = np.diff(np.r_[starts, len(both)]) - 2 * nb_new
+    return surplus_indices(old_keys, keys[starts], surplus), surplus_indices(new_keys, keys[starts], -surplus)
+
+
+def surplus_indices(values, run_keys, surplus):
+    """Indices dans values des surplus[k] premières occurrences de chaque run_keys[k] (surplus > 0)."""
+    keys, counts = run_keys[surplus > 0], surplus[surplus > 0]
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64)
+    # préfiltre par les bits de poids fort (table de la taille de values) : searchsorted sur les seuls candidats
+    values = np.asarray(values, dtype=np.int64)
+    top = max(int(keys[-1]), int(values.max()))
+    shift = max(0, top.bit_length() - len(values).bit_length())
+    flag = np.zeros((top >> shift) + 1, dtype=bool)
+    flag[keys >> shift] = True
+    candidates = np.flatnonzero(flag[values >> shift])
+    position = np.minimum(np.searchsorted(keys, values[candidates]), len(keys) - 1)
+    found = keys[position] == values[candidates]
+    candidates, group = candidates[found], position[found]
+    order = np.argsort(group, kind="stable")
+    group = group[order]
+    rank = np.arange(len(group)) - np.searchsorted(group, group)
+    return np.sort(candidates[order][rank < counts[group]])
+
+
+def incremental_connectivity(previous, graph):
+    """Connectivité de graph (voir PowerGraph.connectivity) mise à jour depuis celle de previous.
+
+    previous est l'instantané précédent du même pays. Les nœuds sont appariés par sa table osmid ->
+    nœud, les lignes comparées à son ensemble de lignes par (paire d'extrémités, active) : deux
+    lignes parallèles de même statut sont interchangeables pour la connectivité, l'osmid des lignes
+    n'intervient pas et une ligne dont le statut change est supprimée puis ajoutée. Sur
+    l'union-find de previous, étendu aux nouveaux nœuds :
+    - les composantes touchées par une suppression (ligne ou nœud) sont réétiquetées à partir de
+      leurs lignes restantes, leurs comptes recalculés ;
+    - les lignes ajoutées sont réunies directement, les comptes des composantes fusionnées additionnés ;
+    - un changement de rôle ou de statut d'un nœud corrige le compte de substations de sa composante.
+    Retourne ((parent, nbsub, nbseg) dans la numérotation de graph, nb lignes ajoutées, nb supprimées).
+    """
+    old_parent, old_nbsub, old_nbseg = (np.asarray(values) for values in previous.connectivity())
+    nb_old = previous.nb_nodes
+    # identifiant étendu : ancien nœud apparié, ou nb_old + rang pour un nœud nouveau
+    extended = osmid_lookup(*previous.osmid_index(), graph.node_osmid)
+    added = np.flatnonzero(extended < 0)
+    extended[added] = nb_old + np.arange(len(added))
+    nb_extended = nb_old + len(added)
+    new_of_extended = np.full(nb_extended, -1, dtype=np.int64)
+    new_of_extended[extended] = np.arange(graph.nb_nodes)
+    parent = np.concatenate((old_parent, np.arange(nb_old, nb_extended)))
+    nbsub = np.concatenate((old_nbsub, np.zeros(len(added), dtype=np.int64)))
+    nbseg = np.concatenate((old_nbseg, np.zeros(len(added), dtype=np.int64)))
+
+    # substations actives : nouveaux nœuds (encore isolés) et changements des nœuds appariés
+    old_sub = previous.active_substations()
+    sub = np.zeros(nb_extended, dtype=bool)
+    sub[extended] = graph.active_substations()
+    nbsub[nb_old:] = sub[nb_old:]
+    changed = np.flatnonzero(sub[:nb_old] != old_sub)
+    np.add.at(nbsub, parent[changed], sub[changed].astype(np.int64) - old_sub[changed])
+
+    # lignes : clé entière (paire d'extrémités non ordonnée, active), diff en multiensemble
+    old_u, old_v = np.asarray(previous.edge_u), np.asarray(previous.edge_v)
+    new_u, new_v = extended[graph.edge_u], extended[graph.edge_v]
+    old_seg, new_seg = previous.active_segments(), graph.active_segments()
+    deleted, inserted = edge_diff(
+        (np.minimum(old_u, old_v) * nb_extended + np.maximum(old_u, old_v)) * 2 + old_seg,
+        (np.minimum(new_u, new_v) * nb_extended + np.maximum(new_u, new_v)) * 2 + new_seg)
+
+    # suppressions : composantes touchées remises à zéro puis réétiquetées avec leurs lignes restantes
+    touched = np.zeros(nb_extended, dtype=bool)
+    touched[parent[old_u[deleted]]] = True
+    touched[parent[np.flatnonzero(new_of_extended[:nb_old] < 0)]] = True
+    if touched.any():
+        members = np.flatnonzero(touched[parent[:nb_old]])
+        nbsub[members] = 0
+        nbseg[members] = 0
+        parent[members] = members
+        # lignes des membres (chacune une fois, depuis son extrémité edge_u), hors suppressions
+        indptr, _, edge_ids = previous.csr()
+        starts, lengths = np.asarray(indptr)[members], np.diff(np.asarray(indptr))[members]
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        edges = np.asarray(edge_ids)[offsets]
+        edges = edges[old_u[edges] == np.repeat(members, lengths)]
+        loop = old_u[edges] == old_v[edges]
+        edges = np.concatenate((edges[~loop], np.unique(edges[loop])))
+        is_deleted = np.zeros(previous.nb_edges, dtype=bool)
+        is_deleted[deleted] = True
+        kept = edges[~is_deleted[edges]]
+        alive = members[new_of_extended[members] >= 0]
+        local_of = np.full(nb_old, -1, dtype=np.int64)
+        local_of[alive] = np.arange(len(alive))
+        _, local = connected_components(csr_matrix((np.ones(len(kept), dtype=np.int8),
+                                                    (local_of[old_u[kept]], local_of[old_v[kept]])),
+                                                   shape=(len(alive), len(alive))), directed=False)
+        parent[alive] = alive[component_roots(local)][local]
+        np.add.at(nbsub, parent[alive], sub[alive])
+        np.add.at(nbseg, parent[old_u[kept]], old_seg[kept])
+
+    # ajouts : fusion des composantes de leurs extrémités dans l'union-find
+    if len(inserted):
+        roots = np.concatenate((find(parent, new_u[inserted]), find(parent, new_v[inserted])))
+        merged, codes = np.unique(roots, return_inverse=True)
+        _, group = connected_components(csr_matrix((np.ones(len(inserted), dtype=np.int8),
+                                                    (codes[:len(inserted)], codes[len(inserted):])),
+                                                   shape=(len(merged), len(merged))), directed=False)
+        group_root = merged[component_roots(group)]
+        group_nbsub = np.bincount(group, weights=nbsub[merged]).astype(np.int64)
+        group_nbseg = np.bincount(group, weights=nbseg[merged]).astype(np.int64)
+        nbsub[merged] = 0
+        nbseg[merged] = 0
+        parent[merged] = group_root[group]
+        nbsub[group_root] = group_nbsub
+        nbseg[group_root] = group_nbseg
+        np.add.at(nbseg, group_root[group[codes[:len(inserted)]]], new_seg[inserted])
+
+    connectivity = new_of_extended[find(parent, extended)], nbsub[extended], nbseg[extended]
+    return connectivity, len(inserted), len(deleted)
+
+
+def source_signature(paths):
+    """Taille et date de modification des fichiers sources, pour invalider un instantané."""
+    return [{"file": Path(p).name, "size": Path(p).stat().st_size, "mtime_ns": Path(p).stat().st_mtime_ns}
+            for p in paths]
+
+
+def save_snapshot(graph, snapshot_dir, sources):
+    snapshot_dir = Path(snapshot_dir)
+    if snapshot_dir.exists():
+        shutil.rmtree(snapshot_dir)
+    snapshot_dir.mkdir(parents=True)
+    for name in SNAPSHOT_ARRAYS:
+        values = getattr(graph, name)
+        if name in ("node_osmid", "edge_osmid"):
+            values = osmid_array(values)
+        np.save(snapshot_dir / f"{name}.npy", values)
+    for name, values in zip(SNAPSHOT_CSR_ARRAYS, graph.csr()):
+        np.save(snapshot_dir / f"{name}.npy", values)
+    for name, values in zip(SNAPSHOT_CONNECTIVITY_ARRAYS, graph.connectivity()):
+        np.save(snapshot_dir / f"{name}.npy", values)
+    for name, values in zip(SNAPSHOT_OSMID_ARRAYS, graph.osmid_index()):
+        np.save(snapshot_dir / f"{name}.npy", values)
+    # meta.json en dernier : un instantané interrompu n'est jamais relu
+    with open(snapshot_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"roles": graph.roles, "statuses": graph.statuses, "nb_missing_nodes": graph.nb_missing_nodes,
+                   "sources": source_signature(sources)}, f, indent=1)
+
+
+def load_snapshot(snapshot_dir, sources=None):
+    """Graphe d'un instantané (tableaux en mmap), ou None s'il est absent ou plus à jour des sources."""
+    snapshot_dir = Path(snapshot_dir)
+    meta_file = snapshot_dir / "meta.json"
+    if not meta_file.is_file():
+        return None
+    with open(meta_file, encoding="utf-8") as f:
+        meta = json.load(f)
+    if sources is not None and meta["sources"] != source_signature(sources):
+        return None
+    if not all((snapshot_dir / f"{name}.npy").is_file() for name in SNAPSHOT_ARRAYS):
+        return None
+    arrays = {name: np.load(snapshot_dir / f"{name}.npy", mmap_mode="r") for name in SNAPSHOT_ARRAYS}
+    graph = PowerGraph(roles=meta["roles"], statuses=meta["statuses"], nb_missing_nodes=meta["nb_missing_nodes"],
+                       **arrays)
+    graph._csr = tuple(np.load(snapshot_dir / f"{name}.npy", mmap_mode="r") for name in SNAPSHOT_CSR_ARRAYS)
+    if all((snapshot_dir / f"{name}.npy").is_file()
+           for name in SNAPSHOT_CONNECTIVITY_ARRAYS + SNAPSHOT_OSMID_ARRAYS):
+        graph._connectivity = tuple(np.load(snapshot_dir / f"{name}.npy", mmap_mode="r")
+                                    for name in SNAPSHOT_CONNECTIVITY_ARRAYS)
+        graph._osmid_index = tuple(np.load(snapshot_dir / f"{name}.npy", mmap_mode="r")
+                                   for name in SNAPSHOT_OSMID_ARRAYS)
+    return graph
+
+
+def load_power_graph(nodes_file, lines_file, snapshot_dir, incremental=True):
+    """Graphe des GeoPackages post_graph nœuds / lignes, relu depuis son instantané s'il est à jour.
+
+    incremental : si l'instantané n'est plus à jour, la connectivité du nouveau graphe est mise à
+    jour depuis la sienne (incremental_connectivity) au lieu d'être recalculée.
+    """
+    sources = (nodes_file, lines_file)
+    graph = load_snapshot(snapshot_dir, sources)
+    if graph is None:
+        nodes = gpd.read_file(nodes_file, columns=["osmid", "grid_role", "status"], ignore_geometry=True,
+                              fid_as_index=True)
+        lines = gpd.read_file(lines_file, columns=["osmid", "node0", "node1", "status"], ignore_geometry=True,
+                              fid_as_index=True)
+        graph = PowerGraph.from_frames(nodes, lines)
+        previous = load_snapshot(snapshot_dir) if incremental else None
+        if previous is not None and previous._connectivity is not None:
+            graph._connectivity, nb_inserted, nb_deleted = incremental_connectivity(previous, graph)
+            print(f"  -- {Path(snapshot_dir).name}: {nb_inserted} lines added, {nb_deleted} removed since last snapshot")
+        del previous
+        save_snapshot(graph, snapshot_dir, sources)
+    return graph
+
+
+def voltage_levels(edge_osmid, line_osmid, line_voltage):
+    """(indice de ligne du graphe, niveau de tension) pour chaque tension de chaque ligne.
+
+    Tensions lues sur les lignes OSM brutes (line_osmid, line_voltage), séparées sur ";" ; une
+    ligne sans tension connue est au niveau "unknown".
+    """
+    edge_osmid, line_osmid = same_kind(osmid_array(edge_osmid), osmid_array(line_osmid))
+    tags = pd.Series(np.asarray(line_voltage, dtype=object), index=line_osmid)
+    tags = tags[~tags.index.duplicated()]
+    levels = tags.reindex(edge_osmid).reset_index(drop=True).astype("string").fillna("") \
+        .str.split(";").explode().str.strip()
+    levels[levels == ""] = "unknown"
+    levels = levels.reset_index().drop_duplicates()
+    return levels["index"].to_numpy(dtype=np.int64), levels.iloc[:, 1].to_numpy(dtype=str)
+
+
+def voltage_connectivity(graph, line_osmid, line_voltage):
+    """Statistiques de connectivité par niveau de tension, en une passe.
+
+    Chaque (niveau, nœud) touché par une ligne de ce niveau est un nœud étiqueté ; une ligne à
+    plusieurs tensions relie ses extrémités à chacun de ses niveaux. Les composantes de tous les
+    niveaux sortent d'un seul connected_components sur les nœuds étiquetés, les comptes de
+    substations et de segments par composante sont des bincount. Une substation compte dans chaque
+    niveau dont une ligne la touche.
+    """
+    edges, levels = voltage_levels(graph.edge_osmid, line_osmid, line_voltage)
+    level_codes, level_names = pd.factorize(levels)
+    edge_u, edge_v = np.asarray(graph.edge_u)[edges], np.asarray(graph.edge_v)[edges]
+    labelled, keys = pd.factorize(np.concatenate((level_codes * graph.nb_nodes + edge_u,
+                                                  level_codes * graph.nb_nodes + edge_v)))
+    keys = np.asarray(keys, dtype=np.int64)
+    nb_labelled = len(keys)
+    adjacency = csr_matrix((np.ones(len(edges), dtype=np.int8), (labelled[:len(edges)], labelled[len(edges):])),
+                           shape=(nb_labelled, nb_labelled))
+    nb_components, components = connected_components(adjacency, directed=False)
+
+    active_sub = graph.active_substations()
+    active_seg = graph.active_segments()
+    nbsub = np.bincount(components, weights=active_sub[keys % graph.nb_nodes], minlength=nb_components).astype(np.int64)
+    nbseg = np.bincount(components[labelled[:len(edges)]], weights=active_seg[edges],
+                        minlength=nb_components).astype(np.int64)
+    component_level = np.zeros(nb_components, dtype=np.int64)
+    component_level[components] = keys // graph.nb_nodes
+
+    rows = []
+    for code, level in enumerate(level_names):
+        in_level = component_level == code
+        stats = connectivity_stats(nbsub[in_level], nbseg[in_level])
+        rows.append({"voltage": level, "nb_lines": int((level_codes == code).sum()),
+                     "nb_substations": int(nbsub[in_level].sum()),
+                     "nb_components_with_substation": int((nbsub[in_level] > 0).sum()), **stats})
+    df = pd.DataFrame(rows, columns=["voltage", "nb_lines", "nb_substations", "nb_components_with_substation",
+                                     "substation_connectivity_pct", "substation_connectivity"])
+    # niveaux par tension décroissante, valeurs non numériques en fin de tableau
+    df["voltage_value"] = pd.to_numeric(df["voltage"], errors="coerce")
+    return df.sort_values("voltage_value", ascending=False, na_position="last").drop(columns="voltage_value")
+
+
+def connectivity_stats(nbsub, nbseg):
+    """substation_connectivity et substation_connectivity_pct à partir des comptes par composante."""
+    stats = {}
+    keep = nbsub > 0
+    nbsub, nbseg = nbsub[keep], nbseg[keep]
+    if not len(nbsub):
+        stats["substation_connectivity"] = 0
+        stats["substation_connectivity_pct"] = 0
+        return stats
+
+    order = np.lexsort((-nbseg, -nbsub))
+    nbsub, nbseg = nbsub[order].tolist(), nbseg[order].tolist()
+    # même ordre de sommation que l'ancienne boucle sur le DataFrame : flottants identiques
+    cumsum = 0
+    for i, sub in enumerate(nbsub):
+        cumsum += sub / (i + 1)
+    stats["substation_connectivity_pct"] = cumsum / sum(nbsub)
+
+    subseg_text = [f"{sub}x{seg}" for sub, seg in zip(nbsub, nbseg)]
+    counts = pd.Series(subseg_text).value_counts()
+    stats["substation_connectivity"] = " + ".join(
+        [f"{counts[subseg]}^({subseg})" if counts[subseg] != 1 else f"{subseg}"
+         for subseg in pd.unique(pd.Series(subseg_text)).tolist()])
+    return stats
@@ -0,0 +1,136 @@
+"""
+Fragilité N-1 du réseau d'un pays : lignes ponts et substations points d'articulation.
+
+Un pont est une ligne dont la perte coupe sa composante en deux ; il est critique si les deux côtés
+contiennent des substations (non déconnectées). Une substation point d'articulation coupe le réseau
+si elle disparaît ; elle est critique si au moins deux des morceaux restants contiennent des
+substations.
+
+Parcours en profondeur itératif de Tarjan (temps linéaire, sans récursion) sur l'adjacence CSR de
+graph_engine.PowerGraph, avec des listes indexées par nœud. Le parent est exclu par indice de ligne
+et non par nœud : deux lignes parallèles entre deux nœuds ne sont jamais des ponts.
+"""
+
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+
+def bridges_and_articulations(graph):
+    """Ponts et points d'articulation du graphe.
+
+    Retourne un dict de tableaux :
+        bridges               indices des lignes ponts
+        bridge_substations    substations du plus petit côté de chaque pont
+        articulations         nœuds points d'articulation
+        articulation_pieces   nombre de morceaux contenant des substations sans chaque point d'articulation
+    """
+    indptr, neighbors, edge_ids = (np.asarray(a).tolist() for a in graph.csr())
+    nb_nodes = graph.nb_nodes
+    weight = graph.role_mask("substation") & ~graph.status_mask(graph.node_status, "disconnected")
+    subtree = weight.astype(np.int64).tolist()
+
+    disc = [0] * nb_nodes
+    low = [0] * nb_nodes
+    parent_edge = [-1] * nb_nodes
+    cursor = indptr[:-1]
+    separated = [0] * nb_nodes      # substations des sous-arbres détachés par chaque nœud
+    pieces = [0] * nb_nodes         # sous-arbres détachés contenant des substations
+    nb_children = [0] * nb_nodes    # sous-arbres détachés (point d'articulation si > 0, > 1 pour une racine)
+    bridge_edges, bridge_children = [], []
+    roots = []
+    time = 0
+    for root in range(nb_nodes):
+        if disc[root]:
+            continue
+        roots.append(root)
+        time += 1
+        disc[root] = low[root] = time
+        stack = [root]
+        while stack:
+            x = stack[-1]
+            position = cursor[x]
+            if position < indptr[x + 1]:
+                cursor[x] = position + 1
+                edge = edge_ids[position]
+                if edge == parent_edge[x]:
+                    continue
+                y = neighbors[position]
+                if disc[y]:
+                    if disc[y] < low[x]:
+                        low[x] = disc[y]
+                else:
+                    time += 1
+                    disc[y] = low[y] = time
+                    parent_edge[y] = edge
+                    stack.append(y)
+                continue
+            stack.pop()
+            if not stack:
+                break
+            p = stack[-1]
+            subtree[p] += subtree[x]
+            if low[x] < low[p]:
+                low[p] = low[x]
+            if low[x] >= disc[p]:
+                nb_children[p] += 1
+                separated[p] += subtree[x]
+                pieces[p] += subtree[x] > 0
+                if low[x] > disc[p]:
+                    bridge_edges.append(parent_edge[x])
+                    bridge_children.append(x)
+
+    subtree = np.array(subtree, dtype=np.int64)
+    nb_children = np.array(nb_children, dtype=np.int64)
+    pieces = np.array(pieces, dtype=np.int64)
+    is_root = np.zeros(nb_nodes, dtype=bool)
+    is_root[roots] = True
+    # substations de la composante de chaque nœud : celles du sous-arbre de sa racine
+    labels = np.asarray(graph.components())
+    total = np.zeros(int(labels.max()) + 1 if nb_nodes else 0, dtype=np.int64)
+    total[labels[is_root]] = subtree[is_root]
+    total = total[labels]
+
+    bridge_children = np.array(bridge_children, dtype=np.int64)
+    below = subtree[bridge_children]
+    articulations = np.flatnonzero(np.where(is_root, nb_children > 1, nb_children > 0))
+    # morceau restant côté parent (vide pour une racine)
+    rest = total - weight - np.array(separated, dtype=np.int64)
+    return {
+        "bridges": np.array(bridge_edges, dtype=np.int64),
+        "bridge_substations": np.minimum(below, total[bridge_children] - below),
+        "articulations": articulations,
+        "articulation_pieces": pieces[articulations] + (rest[articulations] > 0),
+    }
+
+
+def fragility_stats(graph, fragility):
+    """Comptes par pays : ponts, ponts critiques, substations points d'articulation (critiques)."""
+    substation = graph.role_mask("substation")[fragility["articulations"]]
+    return {
+        "nb_bridges": len(fragility["bridges"]),
+        "nb_critical_bridges": int((fragility["bridge_substations"] > 0).sum()),
+        "nb_articulation_substations": int(substation.sum()),
+        "nb_critical_articulation_substations": int((substation & (fragility["articulation_pieces"] > 1)).sum()),
+    }
+
+
+def save_critical_lines(graph, fragility, lines_file, output_file):
+    """GeoPackage des ponts critiques : seules leurs géométries sont lues, par fid.
+
+    Sans pont critique, le fichier d'un run précédent est supprimé.
+    """
+    critical = fragility["bridge_substations"] > 0
+    bridges = fragility["bridges"][critical]
+    if not len(bridges):
+        Path(output_file).unlink(missing_ok=True)
+        return 0
+    fids = np.asarray(graph.edge_fid)[bridges]
+    lines = gpd.read_file(lines_file, fids=fids, fid_as_index=True)
+    # substations isolées du reste du réseau par la perte de la ligne (plus petit côté)
+    lines["substations_cut"] = pd.Series(fragility["bridge_substations"][critical], index=fids) \
+        .reindex(lines.index).to_numpy()
+    lines.to_file(output_file, driver="GPKG")
+    return len(lines)
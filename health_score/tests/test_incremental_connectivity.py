@@ -0,0 +1,79 @@
+"""
+Connectivité incrémentale (graph_engine.incremental_connectivity) contre un recalcul complet.
+
+Graphes aléatoires locaux ; chaque extrait suivant supprime et ajoute des lignes et des nœuds,
+inverse des extrémités, change des statuts et des rôles. Les mises à jour sont enchaînées à
+travers des instantanés, comme d'une semaine à l'autre. Lancer depuis la racine :
+python -m pytest health_score/tests
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from graph_engine import (PowerGraph, connectivity_stats, incremental_connectivity, load_snapshot,  # noqa: E402
+                          save_snapshot)
+
+
+def random_frames(rng, nb_nodes, nb_lines, prefix=None):
+    osmid = np.arange(nb_nodes) if prefix is None else np.array([f"{prefix}{i}" for i in range(nb_nodes)])
+    nodes = pd.DataFrame({"osmid": osmid, "grid_role": rng.choice(["substation", "lambda_node"], nb_nodes),
+                          "status": rng.choice(["connected", "disconnected"], nb_nodes, p=[0.8, 0.2])})
+    u = rng.integers(0, nb_nodes, nb_lines)
+    v = np.clip(u + rng.integers(-4, 5, nb_lines), 0, nb_nodes - 1)
+    lines = pd.DataFrame({"osmid": np.arange(nb_lines), "node0": osmid[u], "node1": osmid[v],
+                          "status": rng.choice(["connected", "disconnected"], nb_lines, p=[0.9, 0.1])})
+    return nodes, lines
+
+
+def next_extract(rng, nodes, lines, step):
+    """Extrait suivant : lignes et nœuds supprimés / ajoutés, extrémités inversées, statuts et rôles changés."""
+    lines = lines.drop(lines.sample(frac=rng.random() * 0.1, random_state=step).index)
+    ids = nodes["osmid"].to_numpy()
+    new_ids = np.array([f"{ids[0]}new{step}_{i}" for i in range(10)]) if ids.dtype == object \
+        else ids.max() + 1 + np.arange(10)
+    ends = np.concatenate((ids, new_ids))
+    nb_added = int(rng.integers(0, 40))
+    lines = pd.concat([lines, pd.DataFrame({"osmid": 10 ** 6 * (step + 1) + np.arange(nb_added),
+                                            "node0": rng.choice(ends, nb_added), "node1": rng.choice(ends, nb_added),
+                                            "status": "connected"})], ignore_index=True)
+    lines.loc[lines.index[:5], ["node0", "node1"]] = lines.loc[lines.index[:5], ["node1", "node0"]].to_numpy()
+    flipped = lines.sample(3, random_state=step).index
+    lines.loc[flipped, "status"] = np.where(lines.loc[flipped, "status"] == "connected", "disconnected", "connected")
+    nodes = pd.concat([nodes.drop(nodes.sample(5, random_state=step).index),
+                       pd.DataFrame({"osmid": new_ids, "grid_role": "substation", "status": "connected"})],
+                      ignore_index=True)
+    changed = nodes.sample(5, random_state=step).index
+    nodes.loc[changed, "grid_role"] = rng.choice(["substation", "lambda_node"], len(changed))
+    return nodes.sample(frac=1, random_state=step).reset_index(drop=True), lines.reset_index(drop=True)
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_incremental_matches_full(seed, tmp_path):
+    rng = np.random.default_rng(seed)
+    nodes, lines = random_frames(rng, int(rng.integers(20, 2000)), int(rng.integers(10, 2000)),
+                                 prefix="n" if seed % 3 == 1 else None)
+    save_snapshot(PowerGraph.from_frames(nodes, lines), tmp_path / "graph", [])
+    for step in range(3):
+        nodes, lines = next_extract(rng, nodes, lines, 10 * seed + step)
+        graph = PowerGraph.from_frames(nodes, lines)
+        (parent, nbsub, nbseg), _, _ = incremental_connectivity(load_snapshot(tmp_path / "graph"), graph)
+
+        full = PowerGraph.from_frames(nodes, lines)
+        labels = full.components()
+        full_nbsub, full_nbseg = full.component_counts(labels)
+        roots = np.flatnonzero(parent == np.arange(graph.nb_nodes))
+        # même partition, une racine par composante portant ses comptes, 0 ailleurs
+        assert (parent[parent] == parent).all()
+        assert len(roots) == len(full_nbsub) and len(np.unique(labels[roots])) == len(roots)
+        assert (labels[parent] == labels).all()
+        assert (nbsub[roots] == full_nbsub[labels[roots]]).all() and (nbseg[roots] == full_nbseg[labels[roots]]).all()
+        assert nbsub.sum() == full_nbsub.sum() and nbseg.sum() == full_nbseg.sum()
+        assert connectivity_stats(nbsub, nbseg) == connectivity_stats(full_nbsub, full_nbseg)
+
+        graph._connectivity = parent, nbsub, nbseg
+        save_snapshot(graph, tmp_path / "graph", [])
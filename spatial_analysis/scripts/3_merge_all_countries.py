@@ -1,17 +1,52 @@
+import argparse
 import json
 from pathlib import Path
 
 import pandas as pd
 from config import WORLD_COUNTRY_DICT
 
-dfs = []
-for ccode in WORLD_COUNTRY_DICT.keys():
-    mypath = Path(f"../build/{ccode}/stats_coverage.json")
-    if mypath.is_file():
-        with open(mypath) as f:
-            mydict = json.load(f)
-        mydict["codeiso2"] = ccode
-        dfs.append(mydict)
-
-df = pd.DataFrame(dfs)
-df.to_excel("../build/0_coverage_score.xlsx")
\ No newline at end of file
+GLOBAL_COVERAGE_FILE = Path("../build/0_global_coverage.csv")
+
+
+def country_stats_files():
+    files = {ccode: Path(f"../build/{ccode}/stats_coverage.json") for ccode in WORLD_COUNTRY_DICT.keys()}
+    return {ccode: path for ccode, path in files.items() if path.is_file()}
+
+
+def choose_source(source, country_files):
+    """'global' (global_coverage.py) ou 'countries' (un JSON par pays) ; en 'auto', la table mondiale
+    n'est retenue que si elle est plus récente que tous les JSON par pays."""
+    if source != "auto":
+        return source
+    if not GLOBAL_COVERAGE_FILE.is_file():
+        return "countries"
+    newest_country = max((path.stat().st_mtime for path in country_files.values()), default=0.0)
+    return "global" if GLOBAL_COVERAGE_FILE.stat().st_mtime >= newest_country else "countries"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the coverage statistics of all countries")
+    parser.add_argument("--source", choices=["auto", "countries", "global"], default="auto",
+                        help="countries: build/<country>/stats_coverage.json, global: build/0_global_coverage.csv, "
+                             "auto: the most recent of the two")
+    args = parser.parse_args()
+
+    country_files = country_stats_files()
+    source = choose_source(args.source, country_files)
+    if source == "global":
+        # keep_default_na=False : "NA" est la Namibie
+        df = pd.read_csv(GLOBAL_COVERAGE_FILE, keep_default_na=False, na_values=[""])
+        print(f" * Source: {GLOBAL_COVERAGE_FILE}")
+    else:
+        dfs = []
+        for ccode, mypath in country_files.items():
+            with open(mypath) as f:
+                mydict = json.load(f)
+            mydict["codeiso2"] = ccode
+            dfs.append(mydict)
+        df = pd.DataFrame(dfs)
+        print(f" * Source: {len(dfs)} stats_coverage.json files")
+        if GLOBAL_COVERAGE_FILE.is_file():
+            print(f" * {GLOBAL_COVERAGE_FILE} ignored (older than the country files, or --source countries)")
+
+    df.to_excel("../build/0_coverage_score.xlsx")
@@ -0,0 +1,31 @@
+"""
+Clés de cache des produits intermédiaires de script_production.py (masque pays, heatmap...).
+
+Une clé est l'empreinte de tout ce qui détermine le produit : fichiers sources (empreinte de
+leur contenu), grille (CRS, transform, taille) et paramètres. Les fichiers en cache sont rangés
+dans ../build/<pays>/cache/ avec la clé dans leur nom : un changement d'entrée donne une autre
+clé, donc un nouveau fichier, sans invalidation explicite.
+"""
+
+import hashlib
+import json
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Empreinte SHA-1 du contenu d'un fichier."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def grid_definition(crs, transform, width, height):
+    return {"crs": str(crs), "transform": [round(v, 6) for v in tuple(transform)[:6]],
+            "width": int(width), "height": int(height)}
+
+
+def cache_key(*parts):
+    """Clé courte et stable à partir d'éléments sérialisables en JSON."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
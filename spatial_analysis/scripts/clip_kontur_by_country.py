@@ -1,55 +1,142 @@
+"""
+Découpe la couche mondiale des centroïdes Kontur en un fichier par pays (clip_population.parquet).
 
+La couche population est lue une seule fois. Les formes de tous les pays (bufferisées de
+kernel_radius + 10 km au sol) sont indexées dans un STRtree, puis chaque centroïde est affecté en une
+seule requête groupée à tous les pays dont il intersecte la forme. Chaque pays est écrit en
+GeoParquet dans ../build/<pays>/.
+
+Un manifeste (../build/0_population_shards.json) garde pour chaque pays l'empreinte de sa forme,
+des paramètres de buffer et de la couche population : seuls les pays dont une de ces entrées a
+changé (ou dont le fichier manque) sont recalculés, sauf avec --force.
+
+Usage:
+    python clip_kontur_by_country.py
+    python clip_kontur_by_country.py --countries FR ES --force
+"""
+
+import argparse
+import json
 import warnings
 from pathlib import Path
 
 import geopandas as gpd
-
+import numpy as np
+from shapely import STRtree
 from shapely.ops import unary_union
 
 
 import config
+from cache import cache_key, file_digest
+from population_store import store_to_geodataframe
+from projection import web_mercator_scale
 
 COUNTRY_CODE = config.COUNTRY_CODE
 kernel_radius = 25000.0
 metric_crs = "EPSG:3857"
 
 data_path = Path("/home/ben/DevProjects/osm-power-grid-map-analysis/data/")
+build_path = Path("../build/")
+manifest_file = build_path / "0_population_shards.json"
 
-population_grid_file = f"../data/kontur_population_20231101_r6_3km_centroids.gpkg"
-gdf_population = gpd.read_file(population_grid_file).to_crs(metric_crs)
+population_grid_file = Path(f"../data/kontur_population_20231101_r6_3km_centroids.gpkg")
+population_store_dir = Path("../data/kontur_population_20231101_r6_store")
 
-def clip_population_by_country(pop_gdf, country_union, crs):
-    # Intersecter pour garder uniquement les parties à l'intérieur du pays (ou en partie)
-    # On suppose qu'il y a au moins une géométrie pays ; si plusieurs, on les unionne
 
-    country_single = gpd.GeoDataFrame(geometry=[country_union], crs=crs)
-    clipped = pop_gdf.sjoin(country_single, how="inner")
-    return clipped
+def shard_file(country_code):
+    return build_path / f"{country_code}/clip_population.parquet"
 
-def main(country_code):
-    output_data_folder = Path(f"../build/{country_code}/")
 
-    # Open files
+def shard_key(country_code, population_stamp):
+    """Empreinte des entrées d'un pays : forme, paramètres de buffer, couche population."""
     country_shape_file = data_path / f"{country_code}/osm_brut_country_shape.gpkg"
-    country = gpd.read_file(country_shape_file).to_crs(metric_crs)
-    country_union = unary_union(country.geometry).buffer(kernel_radius + 10000)
+    return cache_key(file_digest(country_shape_file), kernel_radius, metric_crs, "ground_buffer", population_stamp)
 
-    print(" * Files opened")
 
-    if 'population' not in gdf_population.columns:
-        raise KeyError("La couche population doit contenir le champ 'population'.")
-    print(" * Reprojected layers")
+def population_stamp():
+    # la couche mondiale fait plusieurs Go : taille + date de modification plutôt qu'un hash du contenu
+    source = population_store_dir / "h3.npy" if population_store_dir.is_dir() else population_grid_file
+    stat = source.stat()
+    return [str(source), stat.st_size, stat.st_mtime_ns]
+
 
-    # découpage
-    clipped_pop = clip_population_by_country(gdf_population, country_union, metric_crs)
-    if clipped_pop.empty:
-        warnings.warn("Aucune entité population après découpage par le pays.")
+def load_population():
+    """Centroïdes population en EPSG:3857 : stockage H3 (kontour_to_centroid.py) ou ancien GeoPackage."""
+    if population_store_dir.is_dir():
+        return store_to_geodataframe(population_store_dir)
+    return gpd.read_file(population_grid_file).to_crs(metric_crs)
 
-    print("Population clipped")
 
-    output_data_folder.mkdir(exist_ok = True)
-    clipped_pop.to_file(output_data_folder / f"clip_population.gpkg")
+def load_manifest():
+    if manifest_file.is_file():
+        with open(manifest_file, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def buffered_country_shape(country_code):
+    """Forme du pays bufferisée de kernel_radius + 10 km au sol, en EPSG:3857.
+
+    Un mètre 3857 vaut cos(φ) mètre au sol : le buffer est agrandi du facteur de la latitude la plus
+    haute du pays (web_mercator_scale), pour rester un sur-ensemble des points utiles à
+    script_production.py qui travaille en mètres au sol.
+    """
+    country_shape_file = data_path / f"{country_code}/osm_brut_country_shape.gpkg"
+    country = gpd.read_file(country_shape_file)
+    scale = web_mercator_scale(country)
+    country = country.to_crs(metric_crs)
+    return unary_union(country.geometry).buffer((kernel_radius + 10000) * scale)
+
+
+def partition_population(country_codes, force=False):
+    """Écrit les fichiers population des pays dont les entrées ont changé ; retourne leur liste."""
+    manifest = load_manifest()
+    stamp = population_stamp()
+    keys = {}
+    for country_code in country_codes:
+        try:
+            keys[country_code] = shard_key(country_code, stamp)
+        except FileNotFoundError:
+            warnings.warn(f"Pas de forme pour {country_code}")
+    todo = [cc for cc, key in keys.items()
+            if force or manifest.get(cc) != key or not shard_file(cc).is_file()]
+    print(f" * {len(todo)} countries to partition, {len(keys) - len(todo)} up to date")
+    if not todo:
+        return []
+
+    shapes = [buffered_country_shape(cc) for cc in todo]
+    print(" * Country shapes buffered")
+
+    gdf_population = load_population()
+    if 'population' not in gdf_population.columns:
+        raise KeyError("La couche population doit contenir le champ 'population'.")
+    print(" * Population layer read")
+
+    # une seule requête groupée : couples (centroïde, pays) qui s'intersectent
+    tree = STRtree(shapes)
+    pop_idx, country_idx = tree.query(gdf_population.geometry.values, predicate="intersects")
+    order = np.argsort(country_idx, kind="stable")
+    pop_idx, country_idx = pop_idx[order], country_idx[order]
+    bounds = np.searchsorted(country_idx, np.arange(len(todo) + 1))
+    print(" * Centroids assigned")
+
+    for i, country_code in enumerate(todo):
+        clipped_pop = gdf_population.iloc[pop_idx[bounds[i]:bounds[i + 1]]]
+        if clipped_pop.empty:
+            warnings.warn(f"Aucune entité population après découpage par le pays {country_code}.")
+        shard_file(country_code).parent.mkdir(parents=True, exist_ok=True)
+        clipped_pop.to_parquet(shard_file(country_code))
+        manifest[country_code] = keys[country_code]
+        print(f"   {country_code} : {len(clipped_pop)} centroids")
+
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4, sort_keys=True)
+    return todo
+
 
 if __name__ == "__main__":
-    for key, val in config.WORLD_COUNTRY_DICT.items():
-        main(key)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Partition Kontur population centroids by country")
+    parser.add_argument("--countries", nargs="+", default=list(config.WORLD_COUNTRY_DICT.keys()))
+    parser.add_argument("--force", action="store_true", help="Rebuild every requested country")
+    args = parser.parse_args()
+    partition_population(args.countries, force=args.force)
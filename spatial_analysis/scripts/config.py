@@ -6,6 +6,13 @@ OSM_POWER_TAGS = ["name", "type", "route", "power", "voltage", "substation", "li
 
 COUNTRY_CODE = "CO"
 
+# Paramètres de l'analyse de couverture (script_production.py)
+PIXEL_SIZE = 2000.0  # m
+KERNEL_RADIUS = 15000.0  # m, rayon du noyau quadratique de la heatmap
+SUBSTATION_COVERAGE_RADIUS = 40000.0  # m
+POPULATION_THRESHOLD = 10000.0  # valeur de heatmap au-delà de laquelle une zone est considérée peuplée
+METRIC_CRS = "laea"  # projection équivalente centrée sur chaque pays (projection.py), ou un CRS fixe ("EPSG:3857")
+
 LIST_COUNTRY_CODES = ["AF", "AL", "DZ", "AD", "AO", "AG", "AR", "AM", "AU", "AT", "AZ", "BH", "BD", "BB", "BY", "BE",
                       "BZ", "BJ", "BT", "BO", "BA", "BW", "BR", "BN", "BG", "BF", "BI", "KH", "CM", "CA", "CV", "CF",
                       "TD", "CL", "CO", "KM", "CR", "HR", "CU", "CY", "CZ", "CD", "DK", "DJ", "DM", "DO", "EC", "EG",
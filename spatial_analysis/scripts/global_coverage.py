@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Couverture mondiale en une passe : heatmap et distance aux substations calculées une seule fois
+sur des tuiles couvrant le monde, statistiques par pays et par continent par réduction bincount.
+
+Par rapport à script_production.py lancé pays par pays :
+- les marges partagées entre pays voisins ne sont calculées qu'une fois ;
+- l'index des substations est mondial : une substation juste de l'autre côté de la frontière
+  couvre la population du pays voisin.
+
+Le monde est découpé en tuiles de tile_degrees x tile_degrees (lon/lat). Chaque tuile est traitée
+dans une projection équivalente centrée sur elle (même pixel au sol que le mode par pays, voir
+projection.py) et ne compte que les pixels dont le centre tombe dans sa case lon/lat : aucun
+pixel n'est compté deux fois. Un raster d'étiquettes (indice du pays, 0 hors pays) est rasterisé
+par tuile ; les comptes de pixels peuplés et peuplés non couverts par pays sont des bincount sur
+ces étiquettes. Un pixel revendiqué par deux pays n'est compté que pour le dernier rasterisé.
+
+Entrées : tableaux de population partagés (kontour_to_centroid.py), formes et substations de
+chaque pays dans DATA_PATH.
+Sorties :
+    ../build/0_global_coverage.csv          une ligne par pays (lue par 3_merge_all_countries.py)
+    ../build/0_global_coverage_regions.csv  une ligne par continent
+    ../build/0_global_tiles/<tuile>.tif     seuil non couvert par tuile (--save-tiles)
+
+Usage:
+    python global_coverage.py
+    python global_coverage.py --tile-degrees 5 --threads 4 --save-tiles
+"""
+
+import argparse
+import math
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio
+import shapely
+from pyproj import Transformer
+from rasterio.features import rasterize
+from rasterio.warp import transform_bounds
+from scipy.spatial import cKDTree
+from shapely.geometry import box
+
+import config
+import script_production
+from population_store import attach_point_arrays, points_in_bounds
+from projection import from_web_mercator, web_mercator_bounds
+
+GLOBAL_COVERAGE_FILE = script_production.BUILD_PATH / "0_global_coverage.csv"
+GLOBAL_COVERAGE_REGIONS_FILE = script_production.BUILD_PATH / "0_global_coverage_regions.csv"
+GLOBAL_TILES_PATH = script_production.BUILD_PATH / "0_global_tiles"
+EARTH_RADIUS = 6378137.0
+
+
+def load_country_shapes(country_codes):
+    """Formes des pays en EPSG:4326 ; l'étiquette d'un pays est sa position dans la liste + 1."""
+    codes, geometries = [], []
+    for country_code in country_codes:
+        country_shape_file = script_production.DATA_PATH / f"{country_code}/osm_brut_country_shape.gpkg"
+        if not country_shape_file.is_file():
+            continue
+        country = gpd.read_file(country_shape_file).to_crs("EPSG:4326")
+        codes.append(country_code)
+        geometries.append(shapely.union_all(country.geometry.values))
+    return codes, np.array(geometries, dtype=object)
+
+
+def load_global_substations(country_codes):
+    """Substations de tous les pays (lon, lat), sans doublons entre fichiers de pays voisins."""
+    chunks = []
+    for country_code in country_codes:
+        substation_file = script_production.DATA_PATH / f"{country_code}/post_graph_power_nodes_circuit.gpkg"
+        try:
+            points = gpd.read_file(substation_file).to_crs("EPSG:4326").geometry.representative_point()
+        except Exception:
+            continue
+        chunks.append(np.column_stack((points.x.to_numpy(), points.y.to_numpy())))
+    if not chunks:
+        return np.zeros((0, 2))
+    return np.unique(np.round(np.concatenate(chunks), 7), axis=0)
+
+
+def tile_crs(lon0, lat0, tile_degrees):
+    lon_c, lat_c = lon0 + tile_degrees / 2, lat0 + tile_degrees / 2
+    return f"+proj=laea +lat_0={lat_c:.4f} +lon_0={lon_c:.4f} +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"
+
+
+def substations_near_tile(substations_lonlat, lon0, lat0, tile_degrees, margin_m):
+    """Substations à moins de margin_m (environ) de la case lon/lat, antiméridien compris."""
+    lat_margin = math.degrees(margin_m / EARTH_RADIUS)
+    max_abs_lat = min(max(abs(lat0 - lat_margin), abs(lat0 + tile_degrees + lat_margin)), 89.0)
+    lon_margin = min(180.0, lat_margin / math.cos(math.radians(max_abs_lat)))
+    lon_c = lon0 + tile_degrees / 2
+    dlon = (substations_lonlat[:, 0] - lon_c + 180.0) % 360.0 - 180.0
+    keep = (np.abs(dlon) <= tile_degrees / 2 + lon_margin) \
+        & (substations_lonlat[:, 1] >= lat0 - lat_margin) & (substations_lonlat[:, 1] <= lat0 + tile_degrees + lat_margin)
+    return substations_lonlat[keep]
+
+
+def tile_counts(lon0, lat0, tile_degrees, shapes_tree, shapes, substations_lonlat, population_arrays, nb_labels,
+                n_threads=1, save_tile=False):
+    """Comptes (pixels peuplés, pixels peuplés non couverts) par étiquette de pays pour une tuile."""
+    pixel_size = config.PIXEL_SIZE
+    kernel_radius = config.KERNEL_RADIUS
+    coverage_radius = config.SUBSTATION_COVERAGE_RADIUS
+    population_threshold = config.POPULATION_THRESHOLD
+    pall = np.zeros(nb_labels + 1, dtype=np.int64)
+    pth = np.zeros(nb_labels + 1, dtype=np.int64)
+
+    cell = box(lon0, lat0, lon0 + tile_degrees, lat0 + tile_degrees)
+    labels_in_tile = shapes_tree.query(cell, predicate="intersects")
+    if not len(labels_in_tile):
+        return pall, pth
+
+    crs = tile_crs(lon0, lat0, tile_degrees)
+    bounds = transform_bounds("EPSG:4326", crs, *cell.bounds, densify_pts=21)
+    transform, width, height = script_production.make_raster_grid(bounds, pixel_size)
+
+    # pixels de la tuile : centre dans la case lon/lat et dans un pays
+    to_lonlat = Transformer.from_crs(crs, "EPSG:4326", always_xy=True)
+    cx = transform.c + (np.arange(width) + 0.5) * pixel_size
+    cy = transform.f - (np.arange(height) + 0.5) * pixel_size
+    lon, lat = to_lonlat.transform(*np.meshgrid(cx, cy))
+    owned = (lon >= lon0) & (lon < lon0 + tile_degrees) & (lat >= lat0) & (lat < lat0 + tile_degrees)
+    to_tile = Transformer.from_crs("EPSG:4326", crs, always_xy=True)
+    clip_box = box(*cell.buffer(0.5).bounds)
+    label_shapes = [(shapely.transform(shapely.intersection(shapes[i], clip_box),
+                                       lambda coords: np.column_stack(to_tile.transform(coords[:, 0], coords[:, 1]))),
+                     int(i) + 1)
+                    for i in sorted(labels_in_tile)]
+    labels = rasterize([(geom, label) for geom, label in label_shapes if not geom.is_empty],
+                       out_shape=(height, width), transform=transform, fill=0, dtype=np.uint16)
+    labels[~owned] = 0
+    if not labels.any():
+        return pall, pth
+
+    xs, ys, values = points_in_bounds(population_arrays, web_mercator_bounds(
+        (bounds[0] - kernel_radius, bounds[1] - kernel_radius, bounds[2] + kernel_radius, bounds[3] + kernel_radius),
+        crs))
+    xs, ys = from_web_mercator(xs, ys, crs)
+    heat = script_production.heatmap_from_arrays(np.asarray(xs), np.asarray(ys), values, transform, width, height,
+                                                 kernel_radius, n_threads=n_threads)
+
+    substations = substations_near_tile(substations_lonlat, lon0, lat0, tile_degrees, coverage_radius * 2)
+    sub_xs, sub_ys = to_tile.transform(substations[:, 0], substations[:, 1])
+    sub_xs, sub_ys = np.asarray(sub_xs), np.asarray(sub_ys)
+    tree = cKDTree(np.column_stack((sub_xs, sub_ys))) if len(sub_xs) else None
+    distance = script_production.substation_distance(sub_xs, sub_ys, transform, width, height, coverage_radius,
+                                                     tree=tree)
+
+    populated = (heat > population_threshold) & (labels > 0)
+    uncovered = populated & (distance > coverage_radius)
+    pall += np.bincount(labels[populated], minlength=nb_labels + 1)
+    pth += np.bincount(labels[uncovered], minlength=nb_labels + 1)
+
+    if save_tile:
+        GLOBAL_TILES_PATH.mkdir(parents=True, exist_ok=True)
+        tile_file = GLOBAL_TILES_PATH / f"tile_{lon0:+04.0f}_{lat0:+03.0f}.tif"
+        with script_production.open_tiled_raster(tile_file, width, height, transform, crs, dtype=rasterio.uint8,
+                                                 nodata=0) as dst:
+            dst.write(uncovered.astype(np.uint8), 1)
+    return pall, pth
+
+
+def coverage_table(codes, pall, pth):
+    df = pd.DataFrame({"codeiso2": codes, "nb_pixels_populated": pall, "nb_pixels_not_covered": pth})
+    df["coverage_population"] = [float(round((1 - t / a) * 100, 1)) if a else None for a, t in zip(pall, pth)]
+    return df
+
+
+def global_coverage(country_codes, tile_degrees=10, n_threads=1, save_tiles=False):
+    if not (script_production.POPULATION_ARRAYS_PATH / "meta.json").is_file():
+        raise FileNotFoundError(f"Tableaux de population absents ({script_production.POPULATION_ARRAYS_PATH}) : "
+                                "lancer kontour_to_centroid.py")
+    population_arrays = attach_point_arrays(script_production.POPULATION_ARRAYS_PATH)
+    codes, shapes = load_country_shapes(country_codes)
+    shapes_tree = shapely.STRtree(shapes)
+    substations_lonlat = load_global_substations(codes)
+    print(f" * {len(codes)} countries, {len(substations_lonlat)} substations")
+
+    pall = np.zeros(len(codes) + 1, dtype=np.int64)
+    pth = np.zeros(len(codes) + 1, dtype=np.int64)
+    tiles = [(lon0, lat0) for lat0 in np.arange(-90, 90, tile_degrees) for lon0 in np.arange(-180, 180, tile_degrees)]
+    for i, (lon0, lat0) in enumerate(tiles):
+        tile_pall, tile_pth = tile_counts(float(lon0), float(lat0), tile_degrees, shapes_tree, shapes,
+                                          substations_lonlat, population_arrays, len(codes), n_threads, save_tiles)
+        pall += tile_pall
+        pth += tile_pth
+        if tile_pall.any():
+            print(f" * Tile {i + 1} / {len(tiles)} ({lon0}, {lat0}) : {int(tile_pall.sum())} populated pixels")
+
+    df = coverage_table(codes, pall[1:], pth[1:])
+    df.to_csv(GLOBAL_COVERAGE_FILE, index=False)
+    continent_of = {cc: continent for continent, countries in config.CONTINENTAL_COUNTRY_DICT.items()
+                    for cc in countries}
+    regions = df.assign(continent=df["codeiso2"].map(continent_of)).groupby("continent")[
+        ["nb_pixels_populated", "nb_pixels_not_covered"]].sum()
+    coverage_table(regions.index.tolist(), regions["nb_pixels_populated"].to_numpy(),
+                   regions["nb_pixels_not_covered"].to_numpy()).rename(columns={"codeiso2": "continent"}) \
+        .to_csv(GLOBAL_COVERAGE_REGIONS_FILE, index=False)
+    print(f" * {GLOBAL_COVERAGE_FILE} saved")
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="World coverage on a tiled grid, zonal statistics per country")
+    parser.add_argument("--countries", nargs="+", default=list(config.WORLD_COUNTRY_DICT.keys()))
+    parser.add_argument("--tile-degrees", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=1, help="Threads for the heatmap of each tile")
+    parser.add_argument("--save-tiles", action="store_true", help="Save the not-covered raster of each tile")
+    args = parser.parse_args()
+    global_coverage(args.countries, tile_degrees=args.tile_degrees, n_threads=args.threads,
+                    save_tiles=args.save_tiles)
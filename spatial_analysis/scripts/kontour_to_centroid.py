@@ -1,8 +1,29 @@
-import geopandas as gpd
+"""
+Construit le stockage H3 de la population Kontur (voir population_store.py), qui remplace l'ancien
+GeoPackage des centroïdes reprojetés, puis les tableaux de points partagés par les workers
+(x, y, population triés par seau, ouverts en mmap par script_production.py).
 
-population_grid_file = "../data/kontur_population_20231101_r6_3km.gpkg"
+Usage:
+    python kontour_to_centroid.py
+    python kontour_to_centroid.py ../data/kontur_population_20231101_r8_400m.gpkg ../data/kontur_population_20231101_r8_store
+"""
+
+import argparse
 
-gdf = gpd.read_file(population_grid_file).to_crs(epsg=3857)
-gdf["geometry"] = gdf["geometry"].centroid
+from population_store import build_h3_store, export_point_arrays
+
+population_grid_file = "../data/kontur_population_20231101_r6_3km.gpkg"
+population_store_dir = "../data/kontur_population_20231101_r6_store"
+population_arrays_dir = "../data/kontur_population_20231101_r6_arrays"
 
-gdf.to_file("../data/kontur_population_20231101_r6_3km_centroids.gpkg")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the H3-keyed Kontur population store")
+    parser.add_argument("source", nargs="?", default=population_grid_file)
+    parser.add_argument("store", nargs="?", default=population_store_dir)
+    parser.add_argument("arrays", nargs="?", default=population_arrays_dir)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--arrays-only", action="store_true", help="Only re-export arrays from an existing store")
+    args = parser.parse_args()
+    if not args.arrays_only:
+        print(build_h3_store(args.source, args.store, chunk_size=args.chunk_size))
+    export_point_arrays(args.store, args.arrays)
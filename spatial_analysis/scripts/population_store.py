@@ -0,0 +1,207 @@
+"""
+Stockage compact de la population Kontur, indexé par cellule H3.
+
+Kontur publie une population par hexagone H3 (r6 à 3 km, r8 à 400 m...). Au lieu de reprojeter
+chaque hexagone et d'écrire ses centroïdes dans un autre GeoPackage, on garde deux tableaux :
+    h3.npy          identifiants H3 (uint64), triés
+    population.npy  population (float32), dans le même ordre
+    meta.json       résolution, nombre de cellules, fichier source
+Les centroïdes (EPSG:3857) sont calculés à la première demande et conservés à côté
+(centroid_x.npy, centroid_y.npy, voir store_centroids) : les appels suivants de
+clip_kontur_by_country.py et export_point_arrays les relisent en mmap.
+
+La source est lue par paquets de chunk_size lignes sans géométrie : le GeoPackage complet (30 M
+de cellules en r8) n'est jamais chargé en mémoire, seuls les deux tableaux compacts le sont.
+
+Dépendance optionnelle pour les centroïdes : h3ronpy (vectorisé, environ 0,5 µs par cellule), à
+défaut h3 (pip install h3), appelé cellule par cellule : environ 1,3 µs par cellule, soit une
+quarantaine de secondes pour une source r8 (30 M de cellules), une seule fois par stockage.
+"""
+
+import json
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+
+EARTH_RADIUS = 6378137.0  # m, sphère de EPSG:3857
+
+
+def h3_resolution(ids):
+    """Résolution encodée dans les bits 52-55 de l'index H3."""
+    return ((np.asarray(ids, dtype=np.uint64) >> np.uint64(52)) & np.uint64(0xF)).astype(np.int8)
+
+
+def build_h3_store(source_file, store_dir, chunk_size=1_000_000, h3_field="h3", value_field="population"):
+    """Construit le stockage H3 à partir d'un GeoPackage Kontur, lu par paquets."""
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    id_chunks, value_chunks = [], []
+    start = 0
+    while True:
+        chunk = gpd.read_file(source_file, rows=slice(start, start + chunk_size),
+                              columns=[h3_field, value_field], ignore_geometry=True)
+        if len(chunk):
+            id_chunks.append(np.fromiter((int(cell, 16) for cell in chunk[h3_field]), dtype=np.uint64,
+                                         count=len(chunk)))
+            value_chunks.append(chunk[value_field].fillna(0).to_numpy(dtype=np.float32))
+            print(f" * {start + len(chunk)} cells read")
+        if len(chunk) < chunk_size:
+            break
+        start += chunk_size
+
+    ids = np.concatenate(id_chunks) if id_chunks else np.zeros(0, dtype=np.uint64)
+    values = np.concatenate(value_chunks) if value_chunks else np.zeros(0, dtype=np.float32)
+    del id_chunks, value_chunks
+    order = np.argsort(ids, kind="stable")
+    np.save(store_dir / "h3.npy", ids[order])
+    np.save(store_dir / "population.npy", values[order])
+    resolutions = np.unique(h3_resolution(ids)).tolist()
+    meta = {
+        "source": str(source_file),
+        "nb_cells": int(len(ids)),
+        "resolution": resolutions[0] if len(resolutions) == 1 else resolutions,
+        "total_population": float(values.sum(dtype=np.float64)),
+    }
+    with open(store_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=4)
+    return meta
+
+
+def load_h3_store(store_dir, mmap=True):
+    """Retourne (ids, population, meta) ; les tableaux sont projetés en mémoire (mmap) par défaut."""
+    store_dir = Path(store_dir)
+    mmap_mode = "r" if mmap else None
+    ids = np.load(store_dir / "h3.npy", mmap_mode=mmap_mode)
+    values = np.load(store_dir / "population.npy", mmap_mode=mmap_mode)
+    with open(store_dir / "meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    return ids, values, meta
+
+
+def lonlat_to_web_mercator(lon, lat):
+    x = EARTH_RADIUS * np.radians(lon)
+    y = EARTH_RADIUS * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return x, y
+
+
+def cell_centroids(ids):
+    """Centres des cellules H3 en EPSG:3857 (x, y).
+
+    Le centre H3 est le centre sphérique de la cellule : il diffère de l'ordre du mètre
+    du centroïde de l'hexagone reprojeté en 3857 qu'utilisait kontour_to_centroid.py.
+    Vectorisé avec h3ronpy s'il est installé ; sinon boucle Python sur h3 (environ 1,3 µs par cellule).
+    """
+    ids = np.asarray(ids, dtype=np.uint64)
+    try:
+        from h3ronpy.vector import cells_to_coordinates
+    except ImportError:
+        cells_to_coordinates = None
+    if cells_to_coordinates is not None:
+        if not len(ids):
+            return np.zeros(0), np.zeros(0)
+        coordinates = cells_to_coordinates(ids)
+        return lonlat_to_web_mercator(np.asarray(coordinates.column("lng")), np.asarray(coordinates.column("lat")))
+    try:
+        import h3.api.basic_int as h3
+    except ImportError as e:
+        raise ImportError("Les centroïdes H3 nécessitent le paquet h3ronpy ou h3 : pip install h3ronpy") from e
+    latlng = np.fromiter((c for cell in ids.tolist() for c in h3.cell_to_latlng(cell)), dtype=np.float64,
+                         count=2 * len(ids)).reshape(-1, 2)
+    return lonlat_to_web_mercator(latlng[:, 1], latlng[:, 0])
+
+
+def store_centroids(store_dir):
+    """Centroïdes de toutes les cellules du stockage, calculés une fois puis relus en mmap.
+
+    Recalculés si h3.npy est plus récent (stockage reconstruit).
+    """
+    store_dir = Path(store_dir)
+    x_file, y_file = store_dir / "centroid_x.npy", store_dir / "centroid_y.npy"
+    ids_mtime = (store_dir / "h3.npy").stat().st_mtime
+    if not (x_file.is_file() and y_file.is_file()
+            and min(x_file.stat().st_mtime, y_file.stat().st_mtime) >= ids_mtime):
+        ids, _, _ = load_h3_store(store_dir)
+        xs, ys = cell_centroids(ids)
+        np.save(x_file, xs)
+        np.save(y_file, ys)
+    return np.load(x_file, mmap_mode="r"), np.load(y_file, mmap_mode="r")
+
+
+def store_to_geodataframe(store_dir):
+    """Couche de points (EPSG:3857) équivalente à l'ancien GeoPackage des centroïdes."""
+    ids, values, _ = load_h3_store(store_dir)
+    xs, ys = store_centroids(store_dir)
+    return gpd.GeoDataFrame({"h3": np.asarray(ids), "population": np.asarray(values, dtype=np.float64)},
+                            geometry=gpd.points_from_xy(xs, ys), crs="EPSG:3857")
+
+
+# Tableaux de points partagés entre workers
+#
+# x.npy, y.npy (float64, EPSG:3857) et population.npy (float32) triés par seau d'une grille
+# mondiale de bucket_size mètres (ligne puis colonne), plus bucket_start.npy : indice du premier
+# point de chaque seau (format CSR). Les workers ouvrent les fichiers en mmap : les pages sont
+# partagées par le cache du système entre tous les processus, sans copie ni désérialisation de
+# géométries, et l'emprise d'un pays se lit comme quelques tranches contiguës.
+
+HALF_WORLD = np.pi * EARTH_RADIUS  # demi-largeur du monde en EPSG:3857
+
+
+def _bucket_grid(bucket_size):
+    nb_cols = int(np.ceil(2 * HALF_WORLD / bucket_size))
+    return nb_cols, nb_cols  # emprise carrée de EPSG:3857
+
+
+def export_point_arrays(store_dir, arrays_dir, bucket_size=100_000.0):
+    """Exporte les centroïdes du stockage H3 en tableaux triés par seau, projetables en mémoire."""
+    _, values, meta = load_h3_store(store_dir)
+    xs, ys = store_centroids(store_dir)
+    save_point_arrays(xs, ys, values, arrays_dir, bucket_size, meta)
+
+
+def save_point_arrays(xs, ys, values, arrays_dir, bucket_size=100_000.0, meta=None):
+    arrays_dir = Path(arrays_dir)
+    arrays_dir.mkdir(parents=True, exist_ok=True)
+    nb_cols, nb_rows = _bucket_grid(bucket_size)
+    cols = np.clip(((xs + HALF_WORLD) // bucket_size).astype(np.int64), 0, nb_cols - 1)
+    rows = np.clip(((HALF_WORLD - ys) // bucket_size).astype(np.int64), 0, nb_rows - 1)
+    keys = rows * nb_cols + cols
+    order = np.argsort(keys, kind="stable")
+    np.save(arrays_dir / "x.npy", xs[order])
+    np.save(arrays_dir / "y.npy", ys[order])
+    np.save(arrays_dir / "population.npy", np.asarray(values, dtype=np.float32)[order])
+    bucket_start = np.searchsorted(keys[order], np.arange(nb_rows * nb_cols + 1))
+    np.save(arrays_dir / "bucket_start.npy", bucket_start)
+    with open(arrays_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({**(meta or {}), "bucket_size": bucket_size, "crs": "EPSG:3857"}, f, ensure_ascii=False, indent=4)
+
+
+def attach_point_arrays(arrays_dir):
+    """Ouvre les tableaux en mmap (lecture seule, sans copie)."""
+    arrays_dir = Path(arrays_dir)
+    with open(arrays_dir / "meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    arrays = {name: np.load(arrays_dir / f"{name}.npy", mmap_mode="r")
+              for name in ("x", "y", "population", "bucket_start")}
+    arrays["bucket_size"] = meta["bucket_size"]
+    return arrays
+
+
+def points_in_bounds(arrays, bounds):
+    """Points (xs, ys, population) dans bounds = (minx, miny, maxx, maxy), en EPSG:3857.
+
+    Ne lit que les seaux qui recoupent l'emprise : une tranche contiguë par ligne de seaux.
+    """
+    minx, miny, maxx, maxy = bounds
+    bucket_size = arrays["bucket_size"]
+    nb_cols, nb_rows = _bucket_grid(bucket_size)
+    col0, col1 = (int(np.clip((v + HALF_WORLD) // bucket_size, 0, nb_cols - 1)) for v in (minx, maxx))
+    row0, row1 = (int(np.clip((HALF_WORLD - v) // bucket_size, 0, nb_rows - 1)) for v in (maxy, miny))
+    bucket_start = arrays["bucket_start"]
+    slices = [slice(bucket_start[row * nb_cols + col0], bucket_start[row * nb_cols + col1 + 1])
+              for row in range(row0, row1 + 1)]
+    xs = np.concatenate([arrays["x"][s] for s in slices])
+    ys = np.concatenate([arrays["y"][s] for s in slices])
+    values = np.concatenate([arrays["population"][s] for s in slices]).astype(np.float64)
+    inside = (xs >= minx) & (xs <= maxx) & (ys >= miny) & (ys <= maxy)
+    return xs[inside], ys[inside], values[inside]
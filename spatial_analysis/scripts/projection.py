@@ -0,0 +1,149 @@
+"""
+Projection métrique de chaque pays pour script_production.py.
+
+EPSG:3857 n'est métrique qu'à l'équateur : à la latitude φ, un mètre 3857 vaut cos(φ) mètre sur le
+terrain (un pixel de 2 km ne couvre qu'un kilomètre à 60°N, et les rayons de 15 et 40 km sont
+réduits d'autant). Par défaut (config.METRIC_CRS = "laea"), chaque pays est traité dans une
+projection azimutale équivalente de Lambert centrée sur lui : surfaces exactes, échelle des
+distances juste à 1 % près jusqu'à 2000 km du centre (5 % à 4000 km, extrémités de la Russie).
+Un CRS fixe (ex. "EPSG:3857") dans config.METRIC_CRS rétablit l'ancien comportement.
+
+Une seule LAEA ne convient pas aux pays dont des parties sont loin les unes des autres (France et
+outre-mer : facteur d'échelle 1,16 à la Réunion avec une LAEA centrée sur l'ensemble). Les parties
+sont donc regroupées en régions (country_regions) : une partie à plus de REGION_RADIUS du centre
+de toutes les régions existantes ouvre la sienne, avec sa propre LAEA et sa propre grille.
+scale_factor_range donne les facteurs d'échelle extrêmes d'une région, reportés dans le rapport de run.
+
+La population (stockage H3, tableaux partagés, fichiers découpés) reste en EPSG:3857 : les points
+sont reprojetés à la lecture.
+"""
+
+import math
+
+import numpy as np
+import shapely
+from pyproj import Proj, Transformer
+from rasterio.warp import transform_bounds
+
+import config
+
+WEB_MERCATOR = "EPSG:3857"
+REGION_RADIUS = 2000000.0  # m, distance au centre d'une région au-delà de laquelle une partie ouvre une région
+EARTH_RADIUS = 6371008.8  # m, rayon moyen
+
+
+def spherical_centroid(geometries):
+    """Centre (lon, lat) de géométries en EPSG:4326, moyenne des parties pondérée par leur surface.
+
+    La moyenne est faite sur la sphère (vecteurs unitaires) : un pays à cheval sur l'antiméridien
+    (Fidji, Russie) n'est pas centré sur le méridien 0.
+    """
+    parts = shapely.get_parts(np.asarray(geometries))
+    centroids = shapely.centroid(parts)
+    lon = np.radians(shapely.get_x(centroids))
+    lat = np.radians(shapely.get_y(centroids))
+    weights = shapely.area(parts) * np.cos(lat)
+    if not weights.sum():
+        weights = np.ones(len(parts))
+    x = np.sum(weights * np.cos(lat) * np.cos(lon))
+    y = np.sum(weights * np.cos(lat) * np.sin(lon))
+    z = np.sum(weights * np.sin(lat))
+    return math.degrees(math.atan2(y, x)), math.degrees(math.atan2(z, math.hypot(x, y)))
+
+
+def country_metric_crs(country_gdf, metric_crs=None):
+    """CRS métrique du pays : LAEA centrée sur le pays, ou le CRS fixe de config.METRIC_CRS."""
+    metric_crs = config.METRIC_CRS if metric_crs is None else metric_crs
+    if metric_crs != "laea":
+        return metric_crs
+    lon, lat = spherical_centroid(country_gdf.to_crs("EPSG:4326").geometry.values)
+    return laea(lon, lat)
+
+
+def laea(lon, lat):
+    """LAEA centrée sur (lon, lat), en chaîne PROJ."""
+    return f"+proj=laea +lat_0={lat:.4f} +lon_0={lon:.4f} +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"
+
+
+def great_circle_distance(lon1, lat1, lon2, lat2):
+    """Distance (m) sur la sphère entre des points (lon, lat) en degrés."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def country_regions(country_gdf, metric_crs=None, region_radius=REGION_RADIUS):
+    """Parties du pays regroupées en régions, chacune avec son CRS métrique : [(GeoDataFrame, crs), ...].
+
+    Les parties sont prises de la plus grande à la plus petite ; chacune rejoint la première région
+    dont la graine (la partie qui l'a ouverte) est à moins de region_radius, sinon elle ouvre une
+    région. La LAEA de chaque région est centrée sur ses parties (spherical_centroid) ; la première
+    région contient la plus grande partie. Un pays d'un seul tenant, ou un CRS fixe dans
+    config.METRIC_CRS, donne une seule région : le pays entier dans country_metric_crs.
+    """
+    metric_crs = config.METRIC_CRS if metric_crs is None else metric_crs
+    parts = country_gdf.explode(index_parts=False).reset_index(drop=True)
+    if metric_crs != "laea" or len(parts) < 2:
+        return [(country_gdf, country_metric_crs(country_gdf, metric_crs))]
+    geographic = parts.to_crs("EPSG:4326").geometry.values
+    centroids = shapely.centroid(geographic)
+    lon, lat = shapely.get_x(centroids), shapely.get_y(centroids)
+    region = np.full(len(parts), -1)
+    seeds = []
+    for i in np.argsort(-shapely.area(geographic) * np.cos(np.radians(lat)), kind="stable"):
+        if seeds:
+            distance = great_circle_distance(lon[i], lat[i], lon[seeds], lat[seeds])
+            if distance.min() <= region_radius:
+                region[i] = int(np.argmin(distance > region_radius))
+                continue
+        region[i] = len(seeds)
+        seeds.append(i)
+    if len(seeds) == 1:
+        return [(country_gdf, country_metric_crs(country_gdf, metric_crs))]
+    return [(parts[region == k], laea(*spherical_centroid(geographic[region == k]))) for k in range(len(seeds))]
+
+
+def scale_factor_range(country_gdf, crs, max_points=5000):
+    """Facteurs d'échelle extrêmes (méridien et parallèle) de crs sur les sommets du pays.
+
+    1 pour une projection exacte ; une LAEA a un facteur < 1 le long des méridiens loin du
+    centre et > 1 le long des parallèles.
+    """
+    coordinates = shapely.get_coordinates(country_gdf.to_crs("EPSG:4326").geometry.values)
+    if not len(coordinates):
+        return 1.0, 1.0
+    coordinates = coordinates[::max(1, len(coordinates) // max_points)]
+    factors = Proj(crs).get_factors(coordinates[:, 0], coordinates[:, 1])
+    scales = np.concatenate((factors.meridional_scale, factors.parallel_scale))
+    scales = scales[np.isfinite(scales)]
+    return float(scales.min()), float(scales.max())
+
+
+def is_web_mercator(crs):
+    return str(crs).upper() == WEB_MERCATOR
+
+
+def from_web_mercator(xs, ys, crs):
+    """Reprojette des coordonnées EPSG:3857 dans crs."""
+    if is_web_mercator(crs) or len(xs) == 0:
+        return xs, ys
+    return Transformer.from_crs(WEB_MERCATOR, crs, always_xy=True).transform(xs, ys)
+
+
+def web_mercator_bounds(bounds, crs):
+    """Emprise EPSG:3857 couvrant bounds (exprimé dans crs), toute la largeur du monde si elle
+    traverse l'antiméridien."""
+    if is_web_mercator(crs):
+        return bounds
+    minx, miny, maxx, maxy = transform_bounds(crs, WEB_MERCATOR, *bounds, densify_pts=21)
+    if minx > maxx:
+        half_world = math.pi * 6378137.0
+        minx, maxx = -half_world, half_world
+    return minx, miny, maxx, maxy
+
+
+def web_mercator_scale(country_gdf):
+    """Facteur 1/cos(φ) de la latitude la plus éloignée de l'équateur : mètres 3857 par mètre au sol."""
+    _, miny, _, maxy = country_gdf.to_crs("EPSG:4326").total_bounds
+    latitude = min(max(abs(miny), abs(maxy)), 85.0)
+    return 1.0 / math.cos(math.radians(latitude))
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Lance script_production.main sur tous les pays de WORLD_COUNTRY_DICT, en parallèle.
+
+- chaque pays tourne dans son propre processus (spawn) : un plantage, une erreur ou un arrêt par
+  le système (out-of-memory) n'affecte que ce pays ;
+- un budget mémoire par worker (RLIMIT_AS) transforme un dépassement en MemoryError propre ;
+- les pays sont lancés du plus long au plus court selon le modèle de coût partagé
+  (country_scheduler.py, persisté dans ../build/0_cost_model_coverage.json), sans dépasser
+  --memory-cap pour l'ensemble des workers ;
+- les pays dont stats_coverage.json est plus récent que leurs fichiers d'entrée sont sautés
+  (reprise d'un run interrompu), sauf avec --force ;
+- un rapport structuré (statut, durée, erreur, pixels économisés par la projection locale par
+  rapport à EPSG:3857, pire facteur d'échelle de cette projection) est réécrit après chaque pays dans
+  ../build/0_run_report.json ; la sortie de chaque pays est dans ../build/<pays>/run.log.
+
+Usage:
+    python run_world.py --workers 4 --memory-limit 8000 --memory-cap 24000
+    python run_world.py --countries RU CA US --workers 3 --block-size 2048
+    python run_world.py --vector --workers 8              # rafraîchissement rapide, sans raster
+"""
+
+import argparse
+import json
+import multiprocessing
+import multiprocessing.connection
+import resource
+import sys
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+import script_production
+from config import WORLD_COUNTRY_DICT
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from country_scheduler import CountryScheduler
+
+REPORT_FILE = script_production.BUILD_PATH / "0_run_report.json"
+COST_MODEL_FILE = script_production.BUILD_PATH / "0_cost_model_coverage.json"
+
+
+def country_input_files(country_code):
+    data_path = script_production.DATA_PATH
+    return [
+        data_path / f"{country_code}/osm_brut_country_shape.gpkg",
+        data_path / f"{country_code}/post_graph_power_nodes_circuit.gpkg",
+        script_production.population_input_file(country_code),
+    ]
+
+
+def is_up_to_date(country_code, stats_name="stats_coverage.json"):
+    """Le fichier de statistiques existe et est plus récent que tous les fichiers d'entrée du pays."""
+    stats_file = script_production.BUILD_PATH / f"{country_code}/{stats_name}"
+    if not stats_file.is_file():
+        return False
+    stats_mtime = stats_file.stat().st_mtime
+    return all(path.stat().st_mtime <= stats_mtime for path in country_input_files(country_code) if path.exists())
+
+
+def _run_country(country_code, main_kwargs, memory_limit_mb, conn):
+    """Point d'entrée du processus fils : exécute main et renvoie le résultat par le pipe."""
+    if memory_limit_mb:
+        limit = int(memory_limit_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    log_file = script_production.BUILD_PATH / f"{country_code}/run.log"
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    sys.stdout = sys.stderr = open(log_file, "w", encoding="utf-8", buffering=1)
+    try:
+        result = script_production.main(country_code, **main_kwargs)
+        peak_memory_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        conn.send({"status": "success", "result": result, "peak_memory_mb": round(peak_memory_mb, 1)})
+    except MemoryError:
+        conn.send({"status": "failed", "error": f"MemoryError (budget {memory_limit_mb} MB)",
+                   "traceback": traceback.format_exc()})
+    except Exception as e:
+        conn.send({"status": "failed", "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+    finally:
+        conn.close()
+
+
+def receive(conn):
+    """Message du fils (None s'il a fermé le pipe sans répondre) ; le pipe est fermé."""
+    try:
+        return conn.recv()
+    except EOFError:
+        return None
+    finally:
+        conn.close()
+
+
+def write_report(report):
+    REPORT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+
+
+def run_world(country_codes, workers=1, memory_limit_mb=None, memory_cap_mb=None, force=False, main_kwargs=None):
+    main_kwargs = main_kwargs or {}
+    scheduler = CountryScheduler(COST_MODEL_FILE, memory_cap_mb=memory_cap_mb,
+                                 default_memory_mb=memory_limit_mb or 1000.0)
+    stats_name = "stats_coverage_vector.json" if main_kwargs.get("vector") else "stats_coverage.json"
+    report = {}
+    pending = []
+    for country_code in country_codes:
+        if not force and is_up_to_date(country_code, stats_name):
+            report[country_code] = {"status": "skipped", "reason": f"{stats_name} up to date"}
+        else:
+            pending.append(country_code)
+            scheduler.set_input_files(country_code, country_input_files(country_code))
+    pending = scheduler.order(pending)
+    print(f"{len(pending)} countries to run, {len(report)} up to date")
+
+    ctx = multiprocessing.get_context("spawn")
+    running = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            running_memory_mb = sum(scheduler.estimate_memory(code) for code in running)
+            country_code = scheduler.next_job(pending, running_memory_mb)
+            if country_code is None:
+                break
+            pending.remove(country_code)
+            parent_conn, child_conn = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_run_country, name=f"coverage-{country_code}",
+                                  args=(country_code, main_kwargs, memory_limit_mb, child_conn))
+            process.start()
+            child_conn.close()
+            running[country_code] = {"process": process, "conn": parent_conn, "start": time.monotonic(),
+                                     "message": None}
+            print(f"-------- {WORLD_COUNTRY_DICT.get(country_code, '')} ({country_code}) started")
+
+        # les pipes sont attendus avec les sentinelles : un résultat plus gros que le tampon du pipe
+        # bloque le fils dans send() tant que le parent ne l'a pas lu
+        ready = set(multiprocessing.connection.wait(
+            [job["process"].sentinel for job in running.values()]
+            + [job["conn"] for job in running.values() if not job["conn"].closed]))
+        for job in running.values():
+            if job["conn"] in ready:
+                job["message"] = receive(job["conn"])
+        for country_code in [code for code, job in running.items() if job["process"].sentinel in ready]:
+            job = running.pop(country_code)
+            process, start, message = job["process"], job["start"], job["message"]
+            if not job["conn"].closed:
+                message = receive(job["conn"]) if job["conn"].poll() else None
+                job["conn"].close()
+            process.join()
+            if message is None:
+                # processus tué (OOM killer, signal) ou sorti sans réponse
+                message = {"status": "crashed", "error": f"worker exited with code {process.exitcode}"}
+            message["exitcode"] = process.exitcode
+            message["duration_s"] = round(time.monotonic() - start, 1)
+            message["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            result = message.get("result") or {}
+            if result.get("nb_pixels_web_mercator"):
+                message["pixel_savings_pct"] = round(100 * (1 - result["nb_pixels"] / result["nb_pixels_web_mercator"]), 1)
+            if "scale_factor_min" in result:
+                # facteur d'échelle le plus éloigné de 1 parmi les projections du pays (distorsion des distances)
+                message["scale_factor_worst"] = max(result["scale_factor_min"], result["scale_factor_max"],
+                                                    key=lambda factor: abs(factor - 1))
+            report[country_code] = message
+            write_report(report)
+            if message["status"] == "success":
+                scheduler.record(country_code, message["duration_s"], message.get("peak_memory_mb"))
+                scheduler.save()
+            print(f"-------- ({country_code}) {message['status']} in {message['duration_s']} s"
+                  + (f" : {message['error']}" if "error" in message else ""))
+
+    write_report(report)
+    statuses = [r["status"] for r in report.values()]
+    print({status: statuses.count(status) for status in sorted(set(statuses))})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the coverage analysis for every country")
+    parser.add_argument("--countries", nargs="+", default=list(WORLD_COUNTRY_DICT.keys()))
+    parser.add_argument("--workers", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument("--memory-limit", type=int, default=None, help="Memory budget per worker in MB")
+    parser.add_argument("--memory-cap", type=int, default=None,
+                        help="Estimated memory of all running countries must stay under this cap (MB)")
+    parser.add_argument("--force", action="store_true", help="Rerun countries already up to date")
+    parser.add_argument("--block-size", type=int, default=None)
+    parser.add_argument("--sparse", action="store_true")
+    parser.add_argument("--threads", type=int, default=1, help="Threads per country (heatmap, country mask)")
+    parser.add_argument("--adaptive", action="store_true", help="Coarse-to-fine evaluation (stats and threshold only)")
+    parser.add_argument("--vector", action="store_true", help="Vector coverage from centroid distances (quick refresh)")
+    args = parser.parse_args()
+    run_world(args.countries, workers=args.workers, memory_limit_mb=args.memory_limit,
+              memory_cap_mb=args.memory_cap, force=args.force,
+              main_kwargs={"block_size": args.block_size, "sparse": args.sparse, "n_threads": args.threads,
+                           "adaptive": args.adaptive, "vector": args.vector})
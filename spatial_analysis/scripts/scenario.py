@@ -0,0 +1,200 @@
+"""
+Scénarios « et si » sur la couverture d'un pays : ajout ou retrait de substations sans relancer
+script_production.main.
+
+Le scénario garde en mémoire, sur la grille des rasters d'une région du pays (à produire une fois avec
+script_production.py) :
+- les pixels peuplés du pays (raster_population_threshold.tif) : la heatmap ne dépend pas des
+  substations, seul son seuil sert au calcul de couverture ;
+- pour chaque pixel, le nombre de substations à moins du rayon de couverture. Un pixel est
+  couvert si ce nombre est non nul, ce qui équivaut au seuil distance <= rayon du calcul complet.
+
+Ajouter ou retirer une substation ne modifie que les pixels de son disque de couverture
+(environ π·(R/s)² pixels) et met à jour le nombre de pixels non couverts au passage : le taux de
+couverture est immédiat. Les zones non couvertes (érosion, composantes connexes) sont
+calculées à la demande par fenêtres (script_production.hotspot_tile), gardées en cache : seules
+les fenêtres à moins du rayon d'érosion d'un pixel qui a changé d'état sont recalculées.
+
+Exemple :
+    scenario = CoverageScenario("FR")
+    scenario.what_if(add=[(2.35, 48.85), (5.37, 43.30)], crs="EPSG:4326")
+    ids = scenario.add_substations([(2.35, 48.85)], crs="EPSG:4326")
+    scenario.coverage_population()
+    scenario.remove_substations(ids)
+"""
+
+import math
+
+import geopandas as gpd
+import numpy as np
+import rasterio
+from pyproj import Transformer
+from rasterio.transform import array_bounds
+from scipy.spatial import cKDTree
+
+import config
+import script_production
+
+
+class CoverageScenario:
+    """Couverture d'un pays modifiable substation par substation.
+
+    country_code : pays dont les rasters sont dans script_production.BUILD_PATH/<pays>/
+    coverage_radius : rayon de couverture en mètres (config.SUBSTATION_COVERAGE_RADIUS par défaut)
+    region : région du pays dont on prend la grille (script_production.region_file), 0 par défaut ;
+        un pays avec des parties lointaines (outre-mer) a une grille par région
+    """
+
+    def __init__(self, country_code, coverage_radius=None, region=0):
+        self.country_code = country_code
+        self.region = region
+        self.coverage_radius = float(coverage_radius or config.SUBSTATION_COVERAGE_RADIUS)
+        population_threshold_file = script_production.region_file(country_code, "raster_population_threshold.tif",
+                                                                  region)
+        with rasterio.open(population_threshold_file) as src:
+            self.populated = src.read(1) > 0
+            self.transform = src.transform
+            self.crs = src.crs
+        self.height, self.width = self.populated.shape
+        self.pixel_size = self.transform.a
+
+        substation_file = script_production.DATA_PATH / f"{country_code}/post_graph_power_nodes_circuit.gpkg"
+        try:
+            points = gpd.read_file(substation_file).to_crs(self.crs).geometry.representative_point()
+            self.sub_xs, self.sub_ys = points.x.to_numpy(), points.y.to_numpy()
+        except Exception:
+            self.sub_xs, self.sub_ys = np.zeros(0), np.zeros(0)
+        self.active = np.ones(len(self.sub_xs), dtype=bool)
+
+        self.cover_count = np.zeros((self.height, self.width), dtype=np.uint16)
+        flat = self._disk_pixels(self.sub_xs, self.sub_ys)
+        self.cover_count.ravel()[:] = np.bincount(flat, minlength=self.width * self.height)
+        self.nb_populated = int(self.populated.sum())
+        self.nb_not_covered = int((self.populated & (self.cover_count == 0)).sum())
+        # points population pour la population des zones non couvertes, chargés une fois
+        self.population_points = script_production.load_population_points(
+            country_code, array_bounds(self.height, self.width, self.transform), config.KERNEL_RADIUS, self.crs)
+        self.windows = list(script_production.iter_windows(self.width, self.height,
+                                                           script_production.SPARSE_BLOCK_SIZE))
+        self._tiles = {}  # zones non couvertes par fenêtre (col_off, row_off), voir hotspots
+
+    def _disk_pixels(self, xs, ys, chunk_size=2000):
+        """Indices à plat des pixels dont le centre est à moins du rayon de chaque point (avec répétitions)."""
+        s = self.pixel_size
+        radius = self.coverage_radius
+        k = int(math.ceil(radius / s)) + 1
+        di, dj = np.meshgrid(np.arange(-k, k + 1), np.arange(-k, k + 1), indexing="ij")
+        di, dj = di.ravel(), dj.ravel()
+        chunks = []
+        for start in range(0, len(xs), chunk_size):
+            x, y = xs[start:start + chunk_size, np.newaxis], ys[start:start + chunk_size, np.newaxis]
+            rows = np.floor((self.transform.f - y) / s).astype(np.int64) + di
+            cols = np.floor((x - self.transform.c) / s).astype(np.int64) + dj
+            dx = self.transform.c + (cols + 0.5) * s - x
+            dy = self.transform.f - (rows + 0.5) * s - y
+            inside = (dx ** 2 + dy ** 2 <= radius ** 2) \
+                & (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+            chunks.append(rows[inside] * self.width + cols[inside])
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+
+    def _update(self, xs, ys, sign):
+        """Ajoute (sign=1) ou retire (sign=-1) les disques de couverture, en ne touchant que leurs pixels."""
+        pixels, counts = np.unique(self._disk_pixels(xs, ys), return_counts=True)
+        if not len(pixels):
+            return
+        count = self.cover_count.ravel()
+        populated = self.populated.ravel()[pixels]
+        before = populated & (count[pixels] == 0)
+        count[pixels] = (count[pixels].astype(np.int64) + sign * counts).astype(np.uint16)
+        after = populated & (count[pixels] == 0)
+        self.nb_not_covered += int(after.sum()) - int(before.sum())
+        self._invalidate_tiles(pixels[before != after])
+
+    def _invalidate_tiles(self, pixels):
+        """Oublie les zones des fenêtres à moins du halo d'érosion des pixels donnés (indices à plat)."""
+        if not len(pixels) or not self._tiles:
+            return
+        rows, cols = pixels // self.width, pixels % self.width
+        halo = script_production.hotspot_halo(self.transform, script_production.MISSING_COVERAGE_EROSION)
+        row_min, row_max = rows.min() - halo, rows.max() + halo
+        col_min, col_max = cols.min() - halo, cols.max() + halo
+        for window in self.windows:
+            if window.row_off <= row_max and window.row_off + window.height > row_min \
+                    and window.col_off <= col_max and window.col_off + window.width > col_min:
+                self._tiles.pop((window.col_off, window.row_off), None)
+
+    def _to_grid_crs(self, points, crs):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if crs is None:
+            return points[:, 0], points[:, 1]
+        xs, ys = Transformer.from_crs(crs, self.crs, always_xy=True).transform(points[:, 0], points[:, 1])
+        return np.asarray(xs), np.asarray(ys)
+
+    def add_substations(self, points, crs=None):
+        """Ajoute des substations [(x, y), ...] (dans crs, par défaut celui de la grille) ; retourne leurs ids."""
+        xs, ys = self._to_grid_crs(points, crs)
+        ids = np.arange(len(self.sub_xs), len(self.sub_xs) + len(xs))
+        self.sub_xs = np.concatenate((self.sub_xs, xs))
+        self.sub_ys = np.concatenate((self.sub_ys, ys))
+        self.active = np.concatenate((self.active, np.ones(len(xs), dtype=bool)))
+        self._update(xs, ys, 1)
+        return ids
+
+    def remove_substations(self, ids):
+        """Retire des substations par id (ordre du fichier, puis ajouts) ; les ids déjà retirés sont ignorés."""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        ids = ids[self.active[ids]]
+        self.active[ids] = False
+        self._update(self.sub_xs[ids], self.sub_ys[ids], -1)
+        return ids
+
+    def restore_substations(self, ids):
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        ids = ids[~self.active[ids]]
+        self.active[ids] = True
+        self._update(self.sub_xs[ids], self.sub_ys[ids], 1)
+        return ids
+
+    def nearest_substations(self, points, crs=None):
+        """Ids des substations actives les plus proches des points donnés."""
+        xs, ys = self._to_grid_crs(points, crs)
+        active_ids = np.flatnonzero(self.active)
+        _, nearest = cKDTree(np.column_stack((self.sub_xs[active_ids], self.sub_ys[active_ids]))).query(
+            np.column_stack((xs, ys)))
+        return active_ids[nearest]
+
+    def coverage_population(self):
+        """Même définition que stats_coverage.json : 100 x (1 - pixels peuplés non couverts / peuplés)."""
+        if not self.nb_populated:
+            return None
+        return float(round((1 - self.nb_not_covered / self.nb_populated) * 100, 1))
+
+    def hotspots(self):
+        """Zones non couvertes classées par population (voir script_production.missing_coverage_hotspots).
+
+        Seules les fenêtres invalidées depuis le dernier appel sont recalculées.
+        """
+        for window in self.windows:
+            key = (window.col_off, window.row_off)
+            if key not in self._tiles:
+                self._tiles[key] = script_production.hotspot_tile(
+                    self._not_covered, window, self.transform, self.width, self.height,
+                    script_production.MISSING_COVERAGE_EROSION, self.population_points)
+        return script_production.merge_hotspot_tiles(list(self._tiles.values()), self.transform)
+
+    def _not_covered(self, window):
+        rows, cols = window.toslices()
+        return self.populated[rows, cols] & (self.cover_count[rows, cols] == 0)
+
+    def what_if(self, add=(), remove=(), crs=None, hotspots=True):
+        """Évalue un scénario (ajouts de points, retraits d'ids) puis revient à l'état courant."""
+        removed = self.remove_substations(remove) if len(remove) else np.zeros(0, dtype=np.int64)
+        added = self.add_substations(add, crs) if len(add) else np.zeros(0, dtype=np.int64)
+        result = {"coverage_population": self.coverage_population(), "nb_pixels_not_covered": self.nb_not_covered}
+        if hotspots:
+            result["hotspots"] = self.hotspots()
+        self.remove_substations(added)
+        self.restore_substations(removed)
+        nb_kept = len(self.sub_xs) - len(added)
+        self.sub_xs, self.sub_ys, self.active = self.sub_xs[:nb_kept], self.sub_ys[:nb_kept], self.active[:nb_kept]
+        return result
@@ -4,32 +4,35 @@ Script Python pour :
 - découper population.gpkg par shape_country.gpkg (conserver les géométries qui sont dans ou en partie dans le pays)
 - récupérer les centroïdes des entités restantes
 - créer un raster "carte de chaleur" en utilisant le champ "nombre" (modèle quadratique, rayon 25 km, pixels 500m)
-- créer un buffer de 50 km autour des points de substation
-- rasteriser le buffer : 0 = proche de substation (dans le buffer), 1 = hors buffer
+- calculer la distance à la substation la plus proche (transformée de distance euclidienne)
+- seuiller la distance au rayon de couverture : 0 = proche de substation, 1 = au-delà
 - multiplier le raster population par le raster substation
 - définir 1 si la valeur de chaleur > 10000, sinon 0
 
 Usage:
-    python script_geospatial_population_substation.py \
-        --country shape_country.gpkg \
-        --population population.gpkg \
-        --substations substation.gpkg \
-        --out_heatmap heatmap.tif \
-        --out_proximity proximity.tif \
-        --out_combined combined.tif \
-        --out_thresholded thresholded.tif
+    python script_production.py IN BR
+    python script_production.py RU --block-size 2048     # mode fenêtré pour les très grands pays
+    python script_production.py FR --sparse              # uniquement les tuiles proches des terres
+    python script_production.py IN --coverage-radii 20000 30000 40000 --thresholds 5000 10000
+    python script_production.py CA --adaptive            # grille grossière, affinée près des seuils
+    python script_production.py FR --vector              # distances centroïdes -> substations, sans raster
+    Pour tous les pays en parallèle : voir run_world.py
 
 Dépendances : geopandas, rasterio, shapely, numpy, scipy
 Installez-les si nécessaire : pip install geopandas rasterio shapely numpy scipy
 
 Remarques :
-- Le script reprojette les données en EPSG:3857 (mètres) pour les opérations métriques.
-- Pixel size = 500 m (modifiable). Rayon pour le noyau = 25 000 m (25 km).
+- Le script reprojette les données dans une projection équivalente centrée sur chaque pays (mètres
+  au sol, voir projection.py) pour les opérations métriques.
+- Taille de pixel, rayon du noyau, rayon de couverture et seuil de population : voir config.py.
 - Le modèle quadratique utilisé est : w = nombre * (1 - (d/r)^2) pour d <= r, sinon 0.
 """
 
 import argparse
 import math
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import warnings
 
 import json
@@ -37,118 +40,500 @@ import json
 from pathlib import Path
 
 import geopandas as gpd
+import shapely
+import pandas as pd
 import numpy as np
 import rasterio
+from pyproj import Transformer
 from rasterio.drivers import raster_driver_extensions
-from rasterio.features import shapes
 from rasterio.mask import raster_geometry_mask
-from rasterio.transform import from_origin
+from rasterio.transform import Affine, array_bounds, from_origin
+from rasterio.windows import Window
+from rasterio.windows import bounds as window_bounds
+from rasterio.windows import transform as window_transform
 from rasterio.features import rasterize
 from shapely.ops import unary_union
 from shapely.geometry import mapping
+from scipy.ndimage import distance_transform_edt
+from scipy.ndimage import label
+from scipy.ndimage import maximum_filter
+from scipy.signal import convolve
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from scipy.spatial import cKDTree
-from shapely.geometry import shape
+from shapely.geometry import box
+from shapely import STRtree
 
 import config
+from cache import cache_key, file_digest, grid_definition
+from population_store import attach_point_arrays, points_in_bounds
+from projection import WEB_MERCATOR, country_regions, from_web_mercator, scale_factor_range, web_mercator_bounds
 
 DATA_PATH = config.DATA_PATH
 BUILD_PATH = Path("../build/")
+POPULATION_ARRAYS_PATH = Path("../data/kontur_population_20231101_r6_arrays/")  # voir kontour_to_centroid.py
+SPARSE_BLOCK_SIZE = 256
+MISSING_COVERAGE_EROSION = 10000.0  # m, érosion des zones non couvertes avant calcul des centroïdes
+ADAPTIVE_COARSE_FACTOR = 4  # pixel grossier = 4 x 4 pixels fins
+ADAPTIVE_REFINE_BLOCK = 64  # pixels fins, côté des blocs où la heatmap fine est calculée
+VECTOR_HISTOGRAM_BINS = [0, 5, 10, 20, 30, 40, 50, 75, 100, 150, 200, 300, 500]  # km
+# points de coverage_population : écart admis au calcul complet ; 0.0 mesuré sur 20 fixtures de villes
+# autour du seuil (spatial_analysis/tests/test_adaptive_coverage.py), seuls des pixels au bruit de la FFT
+# près du seuil pouvant différer
+ADAPTIVE_TOLERANCE = 0.1
+
+def main(country_code, block_size=None, sparse=False, coverage_radii=None, thresholds=None, n_threads=1,
+         adaptive=False, vector=False):
+    """Analyse de couverture d'un pays.
+
+    block_size : si renseigné, le pays est traité par fenêtres de block_size x block_size pixels
+    (avec un halo égal au rayon du noyau pour la heatmap), chaque fenêtre étant écrite directement
+    dans des GeoTIFF tuilés. La mémoire de pointe dépend alors de la taille de bloc et non plus de
+    l'emprise du pays. Par défaut, la grille entière forme un seul bloc.
+    sparse : ne calcule que les fenêtres à moins d'un rayon de noyau d'une partie du pays
+    (archipels, territoires d'outre-mer, pays à cheval sur l'antiméridien). Les autres tuiles ne
+    sont pas écrites (GeoTIFF creux, lues comme nodata). Les statistiques sont identiques au mode
+    dense, les pixels hors pays n'y contribuant pas.
+    coverage_radii, thresholds : balayage de rayons de couverture et de seuils de population. La
+    heatmap et le champ de distance (calculé jusqu'au plus grand rayon) sont réutilisés pour
+    toutes les combinaisons, écrites dans stats_coverage_sweep.csv.
+    n_threads : nombre de threads pour la heatmap et le masque pays de chaque fenêtre (bandes de
+    lignes, résultat déterministe et égal au calcul mono-thread).
+
+    adaptive : évaluation grossière puis fine (voir adaptive_coverage_window). Seuls les rasters
+    de seuil, les zones non couvertes et les statistiques sont produits ; les rasters pleine
+    résolution d'un run précédent (heatmap, distance et buffer substations, out_coverage_brut.tif)
+    sont supprimés, et stats_coverage.json indique "mode": "adaptive".
+    Les tests sur la grille grossière sont des bornes : les seuils sont ceux du calcul pleine
+    résolution aux arrondis de la FFT près (coverage_population à ADAPTIVE_TOLERANCE point près).
+
+    vector : calcul vectoriel sans raster (voir vector_coverage), écrit dans stats_coverage_vector.json.
+
+    Les parties du pays éloignées de plus de projection.REGION_RADIUS (outre-mer) forment des
+    régions traitées chacune dans sa LAEA et sa grille (region_coverage) : rasters
+    <nom>_region<k>.tif à côté de ceux de la première région, statistiques et zones non couvertes
+    communes. Le résultat donne les facteurs d'échelle extrêmes des projections utilisées.
+
+    La heatmap et son seuil sont mis en cache dans BUILD_PATH/<pays>/cache/ (voir
+    heatmap_cache_files) : quand seules les substations ont changé, ils sont relus au lieu d'être
+    recalculés.
+    """
+    if vector:
+        return vector_coverage(country_code, coverage_radii)
 
-def main(country_code):
     country_shape_file = DATA_PATH / f"{country_code}/osm_brut_country_shape.gpkg"
     substation_file = DATA_PATH / f"{country_code}/post_graph_power_nodes_circuit.gpkg"
 
-    clipped_pop_file = BUILD_PATH / f"{country_code}/clip_population.gpkg"
-    pop_heatmap_file = BUILD_PATH / f"{country_code}/raster_population_heatmap.tif"
-    pop_heatmap_threshold_file = BUILD_PATH / f"{country_code}/raster_population_threshold.tif"
-    sub_buffer_file = BUILD_PATH / f"{country_code}/sub_buffer.tif"
-    out_coverage_file = BUILD_PATH / f"{country_code}/out_coverage_brut.tif"
-    out_coverage_threshold_file = BUILD_PATH / f"{country_code}/out_coverage_threshold.tif"
     missing_coverage_file = BUILD_PATH / f"{country_code}/missing_coverage.gpkg"
+    missing_coverage_hotspots_file = BUILD_PATH / f"{country_code}/missing_coverage_hotspots.csv"
     stats_coverage_file = BUILD_PATH / f"{country_code}/stats_coverage.json"
+    stats_coverage_sweep_file = BUILD_PATH / f"{country_code}/stats_coverage_sweep.csv"
 
-    pixel_size = 2000.0
-    kernel_radius = 15000.0
-    substation_coverage_radius = 40000.0
-    metric_crs = "EPSG:3857"
+    if adaptive and (coverage_radii is not None or thresholds is not None):
+        raise ValueError("Le mode adaptatif ne gère pas le balayage de rayons et de seuils.")
 
-    country = gpd.read_file(country_shape_file).to_crs(metric_crs)
-    clipped_pop = gpd.read_file(clipped_pop_file)
+    country = gpd.read_file(country_shape_file)
     try:
-        substations = gpd.read_file(substation_file).to_crs(metric_crs)
+        substations = gpd.read_file(substation_file)
     except Exception:
         dicstat = {
             "coverage_population": 0.0
         }
         with open(stats_coverage_file, "w", encoding="utf-8") as f:
             json.dump(dicstat, f, ensure_ascii=False, indent=4)
-        return
+        return dicstat
 
     print(" * Files opened (2)")
 
+    regions = country_regions(country)
+    # rasters d'un run précédent découpé en plus de régions
+    for name in REGION_RASTERS:
+        for path in region_files(country_code, name)[len(regions):]:
+            path.unlink()
+    results = []
+    scale_min, scale_max = np.inf, 0.0
+    for region, (region_country, metric_crs) in enumerate(regions):
+        region_country = region_country.to_crs(metric_crs)
+        results.append(region_coverage(country_code, region, region_country, metric_crs, substations,
+                                       country_shape_file, block_size, sparse, coverage_radii, thresholds,
+                                       n_threads, adaptive))
+        region_scale_min, region_scale_max = scale_factor_range(region_country, metric_crs)
+        scale_min, scale_max = min(scale_min, region_scale_min), max(scale_max, region_scale_max)
+    metric_crs = regions[0][1]
+    pall = sum(result["pall"] for result in results)
+    pth = sum(result["pth"] for result in results)
+    sweep_pall = sum(result["sweep_pall"] for result in results)
+    sweep_pth = sum(result["sweep_pth"] for result in results)
+
+    # zones non couvertes de toutes les régions, classées ensemble, dans le CRS de la première
+    hotspot_tables = []
+    for (_, region_crs), result in zip(regions, results):
+        table = result["hotspots"]
+        if len(table) and region_crs != metric_crs:
+            table = table.copy()
+            table["x"], table["y"] = Transformer.from_crs(region_crs, metric_crs, always_xy=True).transform(
+                table["x"].to_numpy(), table["y"].to_numpy())
+        hotspot_tables.append(table)
+    hotspots = pd.concat(hotspot_tables, ignore_index=True) if len(results) > 1 else hotspot_tables[0]
+    if len(results) > 1:
+        hotspots = hotspots.sort_values("population", ascending=False, kind="stable").reset_index(drop=True)
+        hotspots["rank"] = np.arange(1, len(hotspots) + 1)
+    print(" Nb of area after erosion = ", len(hotspots))
+
+    if len(hotspots):
+        gdf_missing_coverage = gpd.GeoDataFrame(hotspots, geometry=gpd.points_from_xy(hotspots["x"], hotspots["y"]),
+                                                crs=metric_crs).drop(columns=["x", "y"])
+        # sauvegarder en GeoPackage, et le classement en tableau
+        gdf_missing_coverage.to_file(missing_coverage_file, driver="GPKG")
+        hotspots.to_csv(missing_coverage_hotspots_file, index=False)
+
+    print("Traitement terminé. Fichiers générés.")
+    print("Computation total > pop = ", pall)
+    print("Computation non connected > pop = ", pth)
+    dicstat = {
+        # aucun pixel peuplé au-dessus du seuil (petite île) : taux non défini
+        "coverage_population":float(round((1 - pth/pall)*100,1)) if pall else None,
+        "mode": "adaptive" if adaptive else "full",
+    }
+    print(dicstat)
+    with open(stats_coverage_file, "w", encoding="utf-8") as f:
+        json.dump(dicstat, f, ensure_ascii=False, indent=4)
+    # taille qu'aurait la grille du pays entier en EPSG:3857 (même marge), pour le rapport de run
+    minx, miny, maxx, maxy = country.to_crs(WEB_MERCATOR).total_bounds
+    margin = config.KERNEL_RADIUS
+    _, web_mercator_width, web_mercator_height = make_raster_grid(
+        (minx - margin, miny - margin, maxx + margin, maxy + margin), config.PIXEL_SIZE)
+    grid = {
+        "metric_crs": metric_crs,
+        "nb_regions": len(regions),
+        "nb_pixels": sum(result["nb_pixels"] for result in results),
+        "nb_pixels_web_mercator": web_mercator_width * web_mercator_height,
+        # facteurs d'échelle extrêmes des projections sur les sommets du pays (1 = distances exactes)
+        "scale_factor_min": round(scale_min, 4),
+        "scale_factor_max": round(scale_max, 4),
+    }
+
+    if coverage_radii is not None or thresholds is not None:
+        coverage_radii = sorted(coverage_radii or [config.SUBSTATION_COVERAGE_RADIUS])
+        thresholds = sorted(thresholds or [config.POPULATION_THRESHOLD])
+        rows = []
+        for i, radius in enumerate(coverage_radii):
+            for j, threshold in enumerate(thresholds):
+                rows.append({
+                    "coverage_radius": radius,
+                    "population_threshold": threshold,
+                    "nb_pixels_populated": int(sweep_pall[j]),
+                    "nb_pixels_not_covered": int(sweep_pth[i, j]),
+                    "coverage_population": float(round((1 - sweep_pth[i, j] / sweep_pall[j]) * 100, 1))
+                    if sweep_pall[j] else None,
+                })
+        pd.DataFrame(rows).to_csv(stats_coverage_sweep_file, index=False)
+        print(f" * Sweep {len(coverage_radii)} radii x {len(thresholds)} thresholds saved")
+
+    return {**dicstat, **grid}
+
+
+def region_file(country_code, name, region=0):
+    """Fichier de sortie d'une région du pays (voir projection.country_regions) : name pour la
+    première, <nom>_region<k><extension> pour les suivantes."""
+    path = BUILD_PATH / f"{country_code}/{name}"
+    return path if region == 0 else path.with_name(f"{path.stem}_region{region}{path.suffix}")
+
+
+def region_files(country_code, name):
+    """Fichiers existants de toutes les régions du pays, dans l'ordre des régions."""
+    paths = []
+    while region_file(country_code, name, len(paths)).is_file():
+        paths.append(region_file(country_code, name, len(paths)))
+    return paths
+
+
+REGION_RASTERS = ["raster_population_heatmap.tif", "raster_population_threshold.tif", "sub_buffer.tif",
+                  "sub_distance.tif", "out_coverage_brut.tif", "out_coverage_threshold.tif"]
+
+
+def region_coverage(country_code, region, country, metric_crs, substations, country_shape_file, block_size=None,
+                    sparse=False, coverage_radii=None, thresholds=None, n_threads=1, adaptive=False):
+    """Couverture d'une région du pays (voir main) dans sa propre grille.
+
+    country : parties de la région, dans metric_crs ; substations : toutes celles du pays (seules
+    celles à moins du plus grand rayon de la grille servent). Écrit les rasters de la région
+    (region_file) et retourne ses comptes de pixels, ses zones non couvertes (coordonnées dans
+    metric_crs) et sa taille de grille.
+    """
+    pop_heatmap_file = region_file(country_code, "raster_population_heatmap.tif", region)
+    pop_heatmap_threshold_file = region_file(country_code, "raster_population_threshold.tif", region)
+    sub_buffer_file = region_file(country_code, "sub_buffer.tif", region)
+    sub_distance_file = region_file(country_code, "sub_distance.tif", region)
+    out_coverage_file = region_file(country_code, "out_coverage_brut.tif", region)
+    out_coverage_threshold_file = region_file(country_code, "out_coverage_threshold.tif", region)
+
+    pixel_size = config.PIXEL_SIZE
+    kernel_radius = config.KERNEL_RADIUS
+    substation_coverage_radius = config.SUBSTATION_COVERAGE_RADIUS
+    population_threshold = config.POPULATION_THRESHOLD
+    sweep = coverage_radii is not None or thresholds is not None
+    coverage_radii = sorted(coverage_radii or [substation_coverage_radius])
+    thresholds = sorted(thresholds or [population_threshold])
+    max_distance = max(coverage_radii + [substation_coverage_radius])
+
     # Définir l'étendue raster à la bbox du country (on peut aussi étendre un peu)
     minx, miny, maxx, maxy = country.total_bounds
     # ajouter marge égale au kernel radius pour capturer influence depuis l'extérieur
     margin = kernel_radius
     bounds = (minx - margin, miny - margin, maxx + margin, maxy + margin)
-    transform, width, height, xv, yv = make_raster_grid(bounds, pixel_size)
-
-    raster_population_heatmap = build_heatmap_from_points(clipped_pop, 'population', transform, width, height, xv, yv, kernel_radius)
-    raster_population_threshold = (raster_population_heatmap > 10000.0).astype(np.uint8)
-    raster_population_threshold = clip_raster_by_country(raster_population_threshold, transform, country, width, height)
-    print(" * Heatmap build")
-    # rasterize buffer substations
-    raster_substation_coverage = rasterize_substation_buffer(substations, pixel_size, bounds, transform, width, height, buffer_distance=substation_coverage_radius)
-
-    # save raster_population_heatmap et raster_substation_coverage
-    save_raster(pop_heatmap_file, raster_population_heatmap, transform, metric_crs, dtype=rasterio.float32, nodata=0)
-    #save_raster(pop_heatmap_threshold_file, raster_population_threshold, transform, metric_crs, dtype=rasterio.float32, nodata=0)
-    save_raster(sub_buffer_file, raster_substation_coverage, transform, metric_crs, dtype=rasterio.uint8, nodata=255)
-    print(" * raster_substation_coverage saved")
-
-    # multiplier
-    # raster_substation_coverage est 0 pour proche et 1 pour loin — instruction dit : créer raster 0 si proche, 1 sinon
-    raster_combined = raster_population_heatmap * raster_substation_coverage.astype(np.float32)
-    raster_combined = clip_raster_by_country(raster_combined, transform, country, width, height)
-    save_raster(out_coverage_file, raster_combined, transform, metric_crs, dtype=rasterio.float32, nodata=0)
-    print(" * raster_combined saved")
-
-    # seuil > 10000 -> 1, else 0
-    raster_threshold = (raster_combined > 10000.0).astype(np.uint8)
-    raster_threshold = clip_raster_by_country(raster_threshold, transform, country, width, height)
-    save_raster(out_coverage_threshold_file, raster_threshold, transform, metric_crs, dtype=rasterio.uint8, nodata=0)
-    print(" * raster_threshold saved")
-
-    # vectorisation du raster raster_threshold
-    mask = raster_threshold > 0  # True pour les pixels à 1
-    features = []
-    for geom, val in shapes(raster_threshold, mask=mask, transform=transform):
-        features.append({
-            "geometry": shape(geom),
-            "properties": {"value": int(val)}
-        })
-
-    # créer GeoDataFrame
-    if features:
-        gdf_missing_coverage = gpd.GeoDataFrame.from_features(features, crs=metric_crs)
-        print(" Nb of area = ", len(gdf_missing_coverage))
-        gdf_missing_coverage["geometry"] = gdf_missing_coverage["geometry"].buffer(-10000)
-        gdf_missing_coverage = gdf_missing_coverage[~gdf_missing_coverage["geometry"].is_empty]
-        print(" Nb of area after buffering= ", len(gdf_missing_coverage))
-        gdf_missing_coverage["geometry"] = gdf_missing_coverage["geometry"].centroid
-        # sauvegarder en GeoPackage
-        gdf_missing_coverage.to_file(missing_coverage_file, driver="GPKG")
+    transform, width, height = make_raster_grid(bounds, pixel_size)
+    print(f" * Region {region}: grid {width} x {height} in {metric_crs}")
 
-    print("Traitement terminé. Fichiers générés.")
-    print("Computation total > pop = ", pall := raster_population_threshold.sum(axis=(0,1)))
-    print("Computation non connected > pop = ", pth := raster_threshold.sum(axis=(0,1)))
+    population_points = load_population_points(country_code, array_bounds(height, width, transform), kernel_radius,
+                                               metric_crs)
+    substation_points = substations.to_crs(metric_crs).geometry.representative_point()
+    sub_xs, sub_ys = substation_points.x.to_numpy(), substation_points.y.to_numpy()
+    # substations des autres régions : inutiles au-delà du plus grand rayon (voire non projetables)
+    grid_minx, grid_miny, grid_maxx, grid_maxy = array_bounds(height, width, transform)
+    useful = np.isfinite(sub_xs) & np.isfinite(sub_ys) \
+        & (sub_xs >= grid_minx - max_distance) & (sub_xs <= grid_maxx + max_distance) \
+        & (sub_ys >= grid_miny - max_distance) & (sub_ys <= grid_maxy + max_distance)
+    sub_xs, sub_ys = sub_xs[useful], sub_ys[useful]
+    substation_tree = cKDTree(np.column_stack((sub_xs, sub_ys))) if len(sub_xs) else None
+    print(" * Geometries merged")
+
+    windows = list(iter_windows(width, height, block_size or (SPARSE_BLOCK_SIZE if sparse else None)))
+    if sparse:
+        nb_windows = len(windows)
+        windows = active_windows(windows, transform, country, halo=kernel_radius)
+        print(f" * Active windows : {len(windows)} / {nb_windows}")
+
+    country_mask_file = cached_country_mask(country_code, country_shape_file, country, metric_crs,
+                                            transform, width, height, windows, n_threads)
+
+    if not adaptive:
+        heatmap_cache_file, population_threshold_cache_file = heatmap_cache_files(
+            country_code, population_digest(country_code), country_shape_file, metric_crs, transform, width, height,
+            kernel_radius, population_threshold, windows if sparse else None)
+        heatmap_cached = heatmap_cache_file.is_file()
+        population_threshold_cached = population_threshold_cache_file.is_file()
+        print(f" * Heatmap cache : {'hit' if heatmap_cached else 'miss'}")
+
+    pall = 0
+    pth = 0
+    nb_refined_pixels = 0
+    sweep_pall = np.zeros(len(thresholds), dtype=np.int64)
+    sweep_pth = np.zeros((len(coverage_radii), len(thresholds)), dtype=np.int64)
+    profile = {"width": width, "height": height, "transform": transform, "crs": metric_crs}
+    if adaptive:
+        # pas de raster pleine résolution en mode adaptatif : ceux d'un run précédent seraient périmés
+        for path in (pop_heatmap_file, sub_buffer_file, sub_distance_file, out_coverage_file):
+            path.unlink(missing_ok=True)
+    with ExitStack() as stack:
+        dst_threshold = stack.enter_context(open_tiled_raster(out_coverage_threshold_file, dtype=rasterio.uint8, nodata=0, **profile))
+        dst_population_threshold = stack.enter_context(open_tiled_raster(pop_heatmap_threshold_file, dtype=rasterio.uint8,
+                                                                         nodata=0, **profile))
+        src_country_mask = stack.enter_context(rasterio.open(country_mask_file))
+        if not adaptive:
+            dst_heatmap = stack.enter_context(open_tiled_raster(pop_heatmap_file, dtype=rasterio.float32, nodata=0, **profile))
+            dst_sub_buffer = stack.enter_context(open_tiled_raster(sub_buffer_file, dtype=rasterio.uint8, nodata=255, **profile))
+            dst_sub_distance = stack.enter_context(open_tiled_raster(sub_distance_file, dtype=rasterio.float32, nodata=-1, **profile))
+            dst_combined = stack.enter_context(open_tiled_raster(out_coverage_file, dtype=rasterio.float32, nodata=0, **profile))
+            # heatmap et seuil population : relus du cache, ou calculés et écrits dans un fichier temporaire
+            if heatmap_cached:
+                heatmap_cache = stack.enter_context(rasterio.open(heatmap_cache_file))
+            else:
+                heatmap_cache = stack.enter_context(open_tiled_raster(temporary_file(heatmap_cache_file),
+                                                                      dtype=rasterio.float32, **profile))
+            if population_threshold_cached:
+                population_threshold_cache = stack.enter_context(rasterio.open(population_threshold_cache_file))
+            else:
+                population_threshold_cache = stack.enter_context(open_tiled_raster(
+                    temporary_file(population_threshold_cache_file), dtype=rasterio.uint8, **profile))
+
+        for window in windows:
+            win_transform = window_transform(window, transform)
+            win_width, win_height = int(window.width), int(window.height)
+            country_mask = src_country_mask.read(1, window=window)
+
+            if adaptive:
+                raster_population_threshold, raster_threshold, nb_pixels = adaptive_coverage_window(
+                    population_points, sub_xs, sub_ys, substation_tree, win_transform, win_width, win_height,
+                    country_mask, kernel_radius, substation_coverage_radius, population_threshold)
+                dst_threshold.write(raster_threshold, 1, window=window)
+                dst_population_threshold.write(raster_population_threshold, 1, window=window)
+                pall += int(raster_population_threshold.sum())
+                pth += int(raster_threshold.sum())
+                nb_refined_pixels += nb_pixels
+                continue
+
+            if heatmap_cached:
+                raster_population_heatmap = heatmap_cache.read(1, window=window)
+            else:
+                xs, ys, values = points_near_window(population_points, win_transform, win_width, win_height, kernel_radius)
+                raster_population_heatmap = heatmap_from_arrays(xs, ys, values, win_transform, win_width, win_height,
+                                                                kernel_radius, n_threads=n_threads)
+                heatmap_cache.write(raster_population_heatmap, 1, window=window)
+            if population_threshold_cached:
+                raster_population_threshold = population_threshold_cache.read(1, window=window)
+            else:
+                raster_population_threshold = (raster_population_heatmap > population_threshold).astype(np.uint8)
+                raster_population_threshold = clip_raster_by_country(raster_population_threshold, country_mask)
+                population_threshold_cache.write(raster_population_threshold, 1, window=window)
+            # distance à la substation la plus proche, puis seuil au rayon de couverture
+            raster_substation_distance = substation_distance(sub_xs, sub_ys, win_transform, win_width, win_height,
+                                                             max_distance, tree=substation_tree,
+                                                             exact_radii=sorted(set(coverage_radii + [substation_coverage_radius])))
+            raster_substation_coverage = (raster_substation_distance > substation_coverage_radius).astype(np.uint8)
+
+            # multiplier
+            # raster_substation_coverage est 0 pour proche et 1 pour loin — instruction dit : créer raster 0 si proche, 1 sinon
+            raster_combined = raster_population_heatmap * raster_substation_coverage.astype(np.float32)
+            raster_combined = clip_raster_by_country(raster_combined, country_mask)
+
+            # seuil > 10000 -> 1, else 0
+            raster_threshold = (raster_combined > population_threshold).astype(np.uint8)
+            raster_threshold = clip_raster_by_country(raster_threshold, country_mask)
+
+            dst_heatmap.write(raster_population_heatmap, 1, window=window)
+            dst_sub_buffer.write(raster_substation_coverage, 1, window=window)
+            dst_sub_distance.write(np.where(np.isfinite(raster_substation_distance), raster_substation_distance, -1)
+                                   .astype(np.float32), 1, window=window)
+            dst_combined.write(raster_combined.astype(np.float32), 1, window=window)
+            dst_threshold.write(raster_threshold, 1, window=window)
+            dst_population_threshold.write(raster_population_threshold, 1, window=window)
+
+            pall += int(raster_population_threshold.sum())
+            pth += int(raster_threshold.sum())
+            if sweep:
+                window_pall, window_pth = sweep_counts(raster_population_heatmap, raster_substation_distance,
+                                                       country_mask, coverage_radii, thresholds)
+                sweep_pall += window_pall
+                sweep_pth += window_pth
+    if adaptive:
+        print(f" * Threshold rasters saved (adaptive, {nb_refined_pixels} / {width * height} pixels refined)")
+    else:
+        if not heatmap_cached:
+            temporary_file(heatmap_cache_file).replace(heatmap_cache_file)
+        if not population_threshold_cached:
+            temporary_file(population_threshold_cache_file).replace(population_threshold_cache_file)
+        print(" * Rasters saved (heatmap, population threshold, substation distance and buffer, combined, threshold)")
+
+    # zones non couvertes : érosion de 10 km, composantes connexes, centroïde et population par zone
+    # fenêtre par fenêtre ; en mode sparse, seules les fenêtres actives (le reste du raster est vide)
+    hotspot_windows = windows if sparse or block_size else iter_windows(width, height, SPARSE_BLOCK_SIZE)
+    with rasterio.open(out_coverage_threshold_file) as src:
+        hotspots = missing_coverage_hotspots(lambda window: src.read(1, window=window), hotspot_windows, transform,
+                                             width, height, MISSING_COVERAGE_EROSION, population_points)
+    return {"pall": pall, "pth": pth, "sweep_pall": sweep_pall, "sweep_pth": sweep_pth, "hotspots": hotspots,
+            "nb_pixels": width * height}
+
+
+def vector_coverage(country_code, coverage_radii=None):
+    """Couverture exacte de la population, sans raster.
+
+    Les centroïdes population du pays (filtrés par la forme du pays) interrogent un cKDTree des
+    substations : la distance à la plus proche donne directement la part de population à moins de
+    chaque rayon de couverture, et un histogramme de population par tranche de distance
+    (VECTOR_HISTOGRAM_BINS, en km, dernière tranche ouverte). Indépendant de la taille de pixel ;
+    à ne pas confondre avec coverage_population du mode raster, qui compte des pixels au-dessus du
+    seuil de chaleur. Les parties lointaines du pays sont projetées dans leur région
+    (projection.country_regions), comme en mode raster.
+    """
+    country_shape_file = DATA_PATH / f"{country_code}/osm_brut_country_shape.gpkg"
+    substation_file = DATA_PATH / f"{country_code}/post_graph_power_nodes_circuit.gpkg"
+    stats_coverage_vector_file = BUILD_PATH / f"{country_code}/stats_coverage_vector.json"
+    substation_coverage_radius = config.SUBSTATION_COVERAGE_RADIUS
+    coverage_radii = sorted(set((coverage_radii or []) + [substation_coverage_radius]))
+
+    country = gpd.read_file(country_shape_file)
+    try:
+        substations = gpd.read_file(substation_file)
+    except Exception:
+        substations = None
+    # distances dans la projection de chaque région du pays (voir main)
+    region_distances, region_values = [], []
+    for region_country, metric_crs in country_regions(country):
+        region_country = region_country.to_crs(metric_crs)
+        xs, ys, values = load_population_points(country_code, region_country.total_bounds, 0.0, metric_crs)
+        country_union = unary_union(region_country.geometry)
+        shapely.prepare(country_union)
+        inside = shapely.contains_xy(country_union, xs, ys)
+        xs, ys, values = xs[inside], ys[inside], values[inside]
+        sub_xy = np.zeros((0, 2))
+        if substations is not None:
+            substation_points = substations.to_crs(metric_crs).geometry.representative_point()
+            sub_xy = np.column_stack((substation_points.x.to_numpy(), substation_points.y.to_numpy()))
+            sub_xy = sub_xy[np.isfinite(sub_xy).all(axis=1)]
+        if len(sub_xy) and len(xs):
+            distance, _ = cKDTree(sub_xy).query(np.column_stack((xs, ys)))
+        else:
+            distance = np.full(len(xs), np.inf)
+        print(f" * {len(xs)} population points, {len(sub_xy)} substations")
+        region_distances.append(distance)
+        region_values.append(values)
+    distance, values = np.concatenate(region_distances), np.concatenate(region_values)
+
+    total = float(values.sum())
+    edges = np.append(np.asarray(VECTOR_HISTOGRAM_BINS, dtype=np.float64) * 1000.0, np.inf)
+    histogram, _ = np.histogram(distance, bins=edges, weights=values)
     dicstat = {
-        "coverage_population":float(round((1 - pth/pall)*100,1))
+        "population_total": round(total, 1),
+        "coverage_population": float(round(100 * values[distance <= substation_coverage_radius].sum() / total, 1))
+        if total else 0.0,
+        "coverage_by_radius": {str(int(radius)): float(round(100 * values[distance <= radius].sum() / total, 2))
+                               if total else 0.0 for radius in coverage_radii},
+        "distance_histogram": [
+            {"min_km": VECTOR_HISTOGRAM_BINS[i],
+             "max_km": VECTOR_HISTOGRAM_BINS[i + 1] if i + 1 < len(VECTOR_HISTOGRAM_BINS) else None,
+             "population": round(float(population), 1)}
+            for i, population in enumerate(histogram)
+        ],
     }
-    print(dicstat)
-    with open(stats_coverage_file, "w", encoding="utf-8") as f:
+    print({key: dicstat[key] for key in ("population_total", "coverage_population")})
+    stats_coverage_vector_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(stats_coverage_vector_file, "w", encoding="utf-8") as f:
         json.dump(dicstat, f, ensure_ascii=False, indent=4)
+    return dicstat
+
+
+def clipped_population_file(country_code):
+    """Population découpée du pays : GeoParquet (clip_kontur_by_country.py) ou ancien GeoPackage."""
+    parquet_file = BUILD_PATH / f"{country_code}/clip_population.parquet"
+    if parquet_file.is_file():
+        return parquet_file
+    return BUILD_PATH / f"{country_code}/clip_population.gpkg"
+
+
+def read_clipped_population(path):
+    if Path(path).suffix == ".parquet":
+        return gpd.read_parquet(path)
+    return gpd.read_file(path)
+
 
+def population_input_file(country_code):
+    """Fichier dont dépend la population du pays : tableaux partagés s'ils existent, sinon fichier découpé."""
+    arrays_meta_file = POPULATION_ARRAYS_PATH / "meta.json"
+    if arrays_meta_file.is_file():
+        return arrays_meta_file
+    return clipped_population_file(country_code)
+
+
+def load_population_points(country_code, bounds, halo, crs=WEB_MERCATOR):
+    """Points population (xs, ys, population) dans crs, triés par y, utiles à la grille bounds (dans crs).
+
+    Avec les tableaux partagés (population_store.export_point_arrays), les points à moins de halo
+    de la grille sont lus en mmap, sans désérialiser de géométries ; les pages sont partagées
+    entre les workers de run_world.py. Sinon, le fichier découpé du pays est lu.
+    Seuls les points à moins d'un rayon de noyau du pays influencent les statistiques : les deux
+    sources donnent les mêmes résultats sur le pays.
+    """
+    if population_input_file(country_code) != clipped_population_file(country_code):
+        minx, miny, maxx, maxy = bounds
+        xs, ys, values = points_in_bounds(attach_point_arrays(POPULATION_ARRAYS_PATH),
+                                          web_mercator_bounds((minx - halo, miny - halo, maxx + halo, maxy + halo), crs))
+    else:
+        clipped_pop = read_clipped_population(clipped_population_file(country_code)).to_crs(WEB_MERCATOR)
+        xs, ys = clipped_pop.geometry.x.to_numpy(), clipped_pop.geometry.y.to_numpy()
+        values = clipped_pop['population'].fillna(0).to_numpy(dtype=np.float64)
+    xs, ys = from_web_mercator(xs, ys, crs)
+    return sort_points_by_y(np.asarray(xs), np.asarray(ys), values)
 
 
 def compute_centroids(gdf):
@@ -160,7 +545,7 @@ def compute_centroids(gdf):
 
 
 def make_raster_grid(bounds, pixel_size):
-    """Retourne transform, width, height et arrays x_centers,y_centers (2D)
+    """Retourne transform, width, height de la grille couvrant bounds
     bounds = (minx, miny, maxx, maxy)
     """
     minx, miny, maxx, maxy = bounds
@@ -168,78 +553,554 @@ def make_raster_grid(bounds, pixel_size):
     height = math.ceil((maxy - miny) / pixel_size)
     # ajuster l'origin pour coller aux pixels
     transform = from_origin(minx, maxy, pixel_size, pixel_size)
-    # centres des pixels
-    xs = minx + (np.arange(width) + 0.5) * pixel_size
-    ys = maxy - (np.arange(height) + 0.5) * pixel_size
-    xv, yv = np.meshgrid(xs, ys)
-    return transform, width, height, xv, yv
+    return transform, width, height
+
+
+def iter_windows(width, height, block_size=None):
+    """Découpe la grille en fenêtres de block_size x block_size pixels (une seule fenêtre si None)."""
+    if block_size is None:
+        yield Window(0, 0, width, height)
+        return
+    for row_off in range(0, height, block_size):
+        for col_off in range(0, width, block_size):
+            yield Window(col_off, row_off, min(block_size, width - col_off), min(block_size, height - row_off))
+
+
+def active_windows(windows, transform, country_gdf, halo):
+    """Fenêtres situées à moins de halo mètres d'une des parties du pays (index STRtree des parties)."""
+    parts = country_gdf.geometry.explode(index_parts=False).to_numpy()
+    tree = STRtree(parts)
+    boxes = [box(*window_bounds(window, transform)) for window in windows]
+    window_idx, _ = tree.query(boxes, predicate="dwithin", distance=halo)
+    return [windows[i] for i in np.unique(window_idx)]
+
 
+def sort_points_by_y(xs, ys, values):
+    """Trie les points selon y pour extraire rapidement ceux d'une bande de la grille."""
+    order = np.argsort(ys, kind="stable")
+    return xs[order], ys[order], values[order]
 
-def clip_raster_by_country(raster_array, transform, country_gdf, width, height):
+
+def points_near_window(sorted_points, transform, width, height, halo):
+    """Points (triés par sort_points_by_y) situés dans l'emprise de la fenêtre élargie du halo."""
+    xs, ys, values = sorted_points
+    minx = transform.c - halo
+    maxx = transform.c + width * transform.a + halo
+    maxy = transform.f + halo
+    miny = transform.f - height * transform.a - halo
+    sel = slice(np.searchsorted(ys, miny, side="left"), np.searchsorted(ys, maxy, side="right"))
+    inside = (xs[sel] >= minx) & (xs[sel] <= maxx)
+    return xs[sel][inside], ys[sel][inside], values[sel][inside]
+
+
+def rasterize_country_mask(country_union, transform, width, height, n_threads=1):
     # créer masque rasterisé du pays
-    country_union = unary_union(country_gdf.geometry)
+    if n_threads > 1:
+        return map_row_bands(partial(rasterize_country_mask, country_union), transform, width, height, n_threads)
     shapes = [(mapping(country_union), 1)]
-    mask = rasterize(shapes, out_shape=(height, width), transform=transform, fill=0, dtype=np.uint8)
-    return raster_array * mask
+    return rasterize(shapes, out_shape=(height, width), transform=transform, fill=0, dtype=np.uint8)
+
+
+def cached_country_mask(country_code, country_shape_file, country_gdf, crs, transform, width, height, windows,
+                        n_threads=1):
+    """Chemin du GeoTIFF du masque pays (1 dans le pays) pour cette grille, calculé une seule fois.
+
+    Le masque est rangé dans BUILD_PATH/<pays>/cache/, sous une clé couvrant le pays, le contenu du
+    fichier de forme, le CRS, la taille de pixel et l'emprise. Tous les découpages (et les
+    statistiques zonales) le relisent par fenêtre au lieu de refaire union et rasterisation.
+    Seules les fenêtres demandées sont écrites ; les autres tuiles (mode creux) se lisent à 0.
+    """
+    key = cache_key("country_mask", country_code, file_digest(country_shape_file),
+                    grid_definition(crs, transform, width, height))
+    path = BUILD_PATH / f"{country_code}/cache/country_mask_{key}.tif"
+    if path.is_file():
+        print(" * Country mask read from cache")
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    country_union = unary_union(country_gdf.geometry)
+    tmp_path = temporary_file(path)
+    with open_tiled_raster(tmp_path, width, height, transform, crs, dtype=rasterio.uint8) as dst:
+        for window in windows:
+            mask = rasterize_country_mask(country_union, window_transform(window, transform),
+                                          int(window.width), int(window.height), n_threads)
+            dst.write(mask, 1, window=window)
+    tmp_path.replace(path)
+    print(" * Country mask computed")
+    return path
+
 
+def population_digest(country_code):
+    """Empreinte de la population du pays : contenu du fichier découpé, ou des tableaux partagés.
 
-def build_heatmap_from_points(centroids_gdf, value_field, transform, width, height, xv, yv, kernel_radius):
+    Les tableaux mondiaux font plusieurs Go : leur empreinte combine meta.json et taille + date de
+    modification des .npy plutôt qu'un hash complet.
+    """
+    path = population_input_file(country_code)
+    if path == clipped_population_file(country_code):
+        return file_digest(path)
+    stats = [(p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in sorted(path.parent.glob("*.npy"))]
+    return cache_key(file_digest(path), stats)
+
+
+def heatmap_cache_files(country_code, population_key, country_shape_file, crs, transform, width, height,
+                        kernel_radius, population_threshold, sparse_windows=None):
+    """Chemins en cache de la heatmap et de son seuil (découpé par le pays).
+
+    La clé de la heatmap couvre la population, la grille, le rayon et la forme du noyau (et les
+    fenêtres actives en mode creux, les autres tuiles n'étant pas écrites) ; celle du seuil y ajoute
+    le seuil et la forme du pays. Quand seules les substations changent, les deux sont relus.
+    """
+    windows_key = [tuple(map(int, (w.col_off, w.row_off, w.width, w.height))) for w in sparse_windows] \
+        if sparse_windows is not None else None
+    key = cache_key("heatmap", population_key, grid_definition(crs, transform, width, height), kernel_radius,
+                    "quadratic", windows_key)
+    threshold_key = cache_key("population_threshold", key, file_digest(country_shape_file), population_threshold)
+    cache_dir = BUILD_PATH / f"{country_code}/cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir / f"heatmap_{key}.tif", cache_dir / f"population_threshold_{threshold_key}.tif"
+
+
+def temporary_file(path):
+    """Fichier d'écriture, renommé en path une fois complet : un run interrompu ne laisse pas de cache partiel."""
+    return path.with_name(path.stem + ".tmp" + path.suffix)
+
+
+def clip_raster_by_country(raster_array, country_mask):
+    return raster_array * country_mask
+
+
+def build_heatmap_from_points(centroids_gdf, value_field, transform, width, height, kernel_radius):
     """Construit la heatmap (float32) en utilisant le noyau quadratique pondéré par value_field.
     - centroids_gdf : GeoDataFrame en CRS métrique et géométrie en points
-    - xv,yv : matrices 2D des coordonnées des centres de pixels
     """
-    # flatten grid centers
-    grid_points = np.column_stack((xv.ravel(), yv.ravel()))  # (Ncells, 2)
-    tree = cKDTree(grid_points)
+    values = centroids_gdf[value_field].fillna(0).to_numpy(dtype=np.float64)
+    xs = centroids_gdf.geometry.x.to_numpy()
+    ys = centroids_gdf.geometry.y.to_numpy()
+    return heatmap_from_arrays(xs, ys, values, transform, width, height, kernel_radius)
 
-    heat = np.zeros(grid_points.shape[0], dtype=np.float64)
 
-    nombres = centroids_gdf[value_field].fillna(0).values
-    pts = np.array([[p.x, p.y] for p in centroids_gdf.geometry])
+def heatmap_from_arrays(xs, ys, values, transform, width, height, kernel_radius, n_threads=1, exact_mask=None):
+    """Heatmap du noyau quadratique w = nb * (1 - (d/r)^2), d <= r, calculée par convolution.
 
+    Les points sont agrégés en une passe sur la grille (élargie de r pour capter l'influence
+    des points hors emprise) sous forme de moments : somme des poids, des poids x décalage au
+    centre du pixel et des poids x décalage². Le noyau étant polynomial en d², la convolution
+    de ces moments par des pochoirs pré-calculés redonne le noyau centré sur la position réelle
+    de chaque point, pour tous les pixels certainement dans le disque. Seul l'anneau de bord
+    (|d_centres - r| <= s/√2), où l'appartenance au disque dépend de la position exacte du
+    point, est évalué point par point de façon vectorisée.
+
+    Le résultat est identique au calcul point par point (cKDTree) aux arrondis flottants près
+    (écart relatif < 1e-5 de la valeur maximale, bruit de la FFT).
+
+    n_threads > 1 : la grille est découpée en bandes de lignes calculées en parallèle (voir
+    map_row_bands) ; chaque bande tire les contributions des points de son halo.
+    exact_mask : si renseigné, l'anneau de bord n'est évalué que pour les points assez proches d'un
+    pixel de exact_mask ; la heatmap n'est alors exacte que sur ces pixels (mode adaptatif).
+    """
+    if n_threads > 1 and exact_mask is None:
+        sorted_points = sort_points_by_y(np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64),
+                                         np.asarray(values, dtype=np.float64))
+
+        def band_heatmap(band_transform, band_width, band_height):
+            band_points = points_near_window(sorted_points, band_transform, band_width, band_height, kernel_radius)
+            return heatmap_from_arrays(*band_points, band_transform, band_width, band_height, kernel_radius)
+
+        return map_row_bands(band_heatmap, transform, width, height, n_threads)
+
+    pixel_size = transform.a
     r = float(kernel_radius)
+    pad = int(math.ceil(r / pixel_size)) + 1
 
-    for (px, py), nb in zip(pts, nombres):
-        if nb == 0:
-            continue
-        # find grid indices within radius
-        idxs = tree.query_ball_point([px, py], r)
-        if not idxs:
+    # binning des points sur la grille élargie de pad pixels
+    col_f = (np.asarray(xs, dtype=np.float64) - transform.c) / pixel_size
+    row_f = (transform.f - np.asarray(ys, dtype=np.float64)) / pixel_size
+    cols = np.floor(col_f).astype(np.int64)
+    rows = np.floor(row_f).astype(np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    keep = (values != 0) & (cols >= -pad) & (cols < width + pad) & (rows >= -pad) & (rows < height + pad)
+    if not keep.any():
+        return np.zeros((height, width), dtype=np.float32)
+    cols, rows, values = cols[keep], rows[keep], values[keep]
+    col_f, row_f = col_f[keep], row_f[keep]
+    # décalage du point par rapport au centre de son pixel (x vers l'est, y vers le nord)
+    off_x = (col_f - cols - 0.5) * pixel_size
+    off_y = -(row_f - rows - 0.5) * pixel_size
+
+    padded_shape = (height + 2 * pad, width + 2 * pad)
+    flat = np.ravel_multi_index((rows + pad, cols + pad), padded_shape)
+    size = padded_shape[0] * padded_shape[1]
+    moments = [
+        values,
+        values * off_x,
+        values * off_y,
+        -values * (off_x ** 2 + off_y ** 2),
+    ]
+    stencils, ring = quadratic_kernel_stencils(pixel_size, r, pad)
+    heat = np.zeros((height, width), dtype=np.float64)
+    for weights, stencil in zip(moments, stencils):
+        grid = np.bincount(flat, weights=weights, minlength=size).reshape(padded_shape)
+        heat += convolve(grid, stencil, mode="valid")
+    # bruit numérique de la FFT autour de zéro
+    heat[np.abs(heat) < 1e-6] = 0.0
+
+    # anneau de bord : distance exacte point -> centre de pixel
+    ring_di, ring_dj = ring
+    if exact_mask is not None:
+        reach = np.pad(exact_mask.astype(bool), pad)
+        reach = maximum_filter(reach, size=2 * pad + 1, mode="constant")
+        near = reach[rows + pad, cols + pad]
+        rows, cols, values, off_x, off_y = rows[near], cols[near], values[near], off_x[near], off_y[near]
+    flat_heat = heat.ravel()
+    chunk = max(1, 2_000_000 // max(len(ring_di), 1))
+    for start in range(0, len(values), chunk):
+        sl = slice(start, start + chunk)
+        ti = rows[sl, np.newaxis] + ring_di[np.newaxis, :]
+        tj = cols[sl, np.newaxis] + ring_dj[np.newaxis, :]
+        dx = ring_dj[np.newaxis, :] * pixel_size - off_x[sl, np.newaxis]
+        dy = -ring_di[np.newaxis, :] * pixel_size - off_y[sl, np.newaxis]
+        d2 = dx ** 2 + dy ** 2
+        inside = (d2 <= r ** 2) & (ti >= 0) & (ti < height) & (tj >= 0) & (tj < width)
+        weights = (values[sl, np.newaxis] * (1.0 - d2 / r ** 2))[inside]
+        flat_heat += np.bincount(ti[inside] * width + tj[inside], weights=weights, minlength=height * width)
+    return heat.astype(np.float32)
+
+
+def quadratic_kernel_stencils(pixel_size, kernel_radius, pad):
+    """Pochoirs (2*pad+1)² du noyau quadratique, indexés par (ligne cible - ligne source,
+    colonne cible - colonne source), appliqués aux moments d'ordre 0, x, y et 2 (voir
+    heatmap_from_arrays). Retourne aussi les décalages (di, dj) de l'anneau de bord.
+    """
+    r = float(kernel_radius)
+    offsets = np.arange(-pad, pad + 1)
+    di, dj = np.meshgrid(offsets, offsets, indexing="ij")
+    dx = dj * pixel_size
+    dy = -di * pixel_size
+    dist = np.sqrt(dx ** 2 + dy ** 2)
+    half_diag = pixel_size / math.sqrt(2)
+    interior = (dist + half_diag <= r).astype(np.float64)
+    ring = (dist + half_diag > r) & (dist - half_diag <= r)
+    stencils = [
+        interior * (1.0 - dist ** 2 / r ** 2),
+        interior * (2.0 * dx / r ** 2),
+        interior * (2.0 * dy / r ** 2),
+        interior / r ** 2,
+    ]
+    return stencils, (di[ring], dj[ring])
+
+
+def map_row_bands(func, transform, width, height, n_threads, min_band_height=64):
+    """Applique func(band_transform, width, band_height) à des bandes de lignes de la grille dans un
+    pool de threads (FFT, rasterisation GDAL et la plupart des opérations NumPy libèrent le GIL).
+    Chaque bande produit ses propres lignes, assemblées dans l'ordre : le résultat ne dépend pas
+    de l'ordonnancement des threads et égal au calcul en une seule bande (aux arrondis de la FFT près)."""
+    nb_bands = max(1, min(n_threads, height // min_band_height))
+    edges = np.linspace(0, height, nb_bands + 1).astype(int)
+    bands = [Window(0, int(start), width, int(stop - start)) for start, stop in zip(edges[:-1], edges[1:])]
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        results = executor.map(lambda band: func(window_transform(band, transform), width, int(band.height)), bands)
+        return np.vstack(list(results))
+
+
+HOTSPOT_COLUMNS = ["rank", "x", "y", "population", "nb_pixels", "area_km2", "nb_pixels_eroded"]
+
+
+def hotspot_halo(transform, erosion_radius):
+    """Halo (pixels) autour d'une fenêtre pour que l'érosion de son cœur soit celle de la grille entière."""
+    return int(math.ceil(erosion_radius / transform.a + 0.5)) + 1
+
+
+def hotspot_tile(read_window, window, transform, width, height, erosion_radius, population_points):
+    """Zones non couvertes du cœur d'une fenêtre : statistiques par composante et labels de bord.
+
+    read_window(window) retourne le raster seuillé d'une fenêtre de la grille (width x height).
+    Les composantes 4-connexes sont étiquetées sur le cœur seul ; l'érosion est calculée sur la
+    fenêtre élargie de hotspot_halo pixels. Un pixel du cœur qui ne survit pas a son pixel
+    extérieur le plus proche dans le halo, la décision est donc celle du calcul sur la grille
+    entière (le bord de la grille compte comme extérieur, pas celui de la fenêtre élargie).
+    Les composantes coupées par le bord de la fenêtre sont raccordées par merge_hotspot_tiles.
+    """
+    pixel_size = transform.a
+    col_off, row_off = int(window.col_off), int(window.row_off)
+    win_width, win_height = int(window.width), int(window.height)
+    halo = hotspot_halo(transform, erosion_radius)
+    col_start, row_start = max(col_off - halo, 0), max(row_off - halo, 0)
+    col_stop, row_stop = min(col_off + win_width + halo, width), min(row_off + win_height + halo, height)
+    inside = read_window(Window(col_start, row_start, col_stop - col_start, row_stop - row_start)) > 0
+    core = (slice(row_off - row_start, row_off - row_start + win_height),
+            slice(col_off - col_start, col_off - col_start + win_width))
+    labels, nb_zones = label(inside[core])
+    tile = {"window": (col_off, row_off, win_width, win_height), "nb_zones": nb_zones}
+    if nb_zones == 0:
+        return tile
+    # seuls les bords sont gardés pour le raccord
+    tile.update(top=labels[0, :].copy(), bottom=labels[-1, :].copy(), left=labels[:, 0].copy(),
+                right=labels[:, -1].copy())
+
+    # distance (m) du centre de chaque pixel au bord de sa zone
+    inside = np.pad(inside, 1, constant_values=True)
+    inside[0, :] &= row_start > 0
+    inside[-1, :] &= row_stop < height
+    inside[:, 0] &= col_start > 0
+    inside[:, -1] &= col_stop < width
+    distance_to_edge = distance_transform_edt(inside)[1:-1, 1:-1][core] * pixel_size - pixel_size / 2
+    eroded = (labels > 0) & (distance_to_edge >= erosion_radius)
+
+    eroded_rows, eroded_cols = np.nonzero(eroded)
+    eroded_labels = labels[eroded_rows, eroded_cols]
+    eroded_rows, eroded_cols = eroded_rows + row_off, eroded_cols + col_off
+    tile["nb_eroded"] = np.bincount(eroded_labels, minlength=nb_zones + 1)
+    tile["sum_x"] = np.bincount(eroded_labels, weights=transform.c + (eroded_cols + 0.5) * pixel_size,
+                                minlength=nb_zones + 1)
+    tile["sum_y"] = np.bincount(eroded_labels, weights=transform.f - (eroded_rows + 0.5) * pixel_size,
+                                minlength=nb_zones + 1)
+    tile["nb_pixels"] = np.bincount(labels.ravel(), minlength=nb_zones + 1)
+    # premier pixel de chaque zone dans l'ordre de la grille entière, pour numéroter comme label()
+    _, first = np.unique(labels.ravel(), return_index=True)
+    first = first[-nb_zones:]
+    tile["first_pixel"] = np.concatenate(([-1], (row_off + first // win_width) * width + col_off + first % win_width))
+
+    xs, ys, values = points_near_window(population_points, window_transform(window, transform), win_width,
+                                        win_height, pixel_size)
+    cols = np.floor((xs - transform.c) / pixel_size).astype(np.int64) - col_off
+    rows = np.floor((transform.f - ys) / pixel_size).astype(np.int64) - row_off
+    on_tile = (cols >= 0) & (cols < win_width) & (rows >= 0) & (rows < win_height)
+    point_labels = labels[rows[on_tile], cols[on_tile]]
+    tile["population"] = np.bincount(point_labels, weights=values[on_tile], minlength=nb_zones + 1)
+    return tile
+
+
+def merge_hotspot_tiles(tiles, transform):
+    """Raccorde les zones des fenêtres (hotspot_tile) qui se touchent par un bord, puis les classe par population.
+
+    Les fenêtres doivent venir d'un même découpage iter_windows (éventuellement filtré) : deux
+    fenêtres voisines partagent un bord entier. Les zones sont numérotées par leur premier pixel
+    dans l'ordre de la grille, comme label() sur la grille entière : à population égale, l'ordre
+    du classement est le même.
+    """
+    pixel_size = transform.a
+    tiles = [tile for tile in tiles if tile["nb_zones"]]
+    if not tiles:
+        return pd.DataFrame(columns=HOTSPOT_COLUMNS)
+    offsets = np.cumsum([0] + [tile["nb_zones"] for tile in tiles])
+    by_origin = {tile["window"][:2]: (tile, offset) for tile, offset in zip(tiles, offsets)}
+    pairs = []
+    for tile, offset in zip(tiles, offsets):
+        col_off, row_off, win_width, win_height = tile["window"]
+        for neighbor_origin, edge, neighbor_edge in (((col_off + win_width, row_off), "right", "left"),
+                                                     ((col_off, row_off + win_height), "bottom", "top")):
+            if neighbor_origin not in by_origin:
+                continue
+            neighbor, neighbor_offset = by_origin[neighbor_origin]
+            here, there = tile[edge], neighbor[neighbor_edge]
+            touching = (here > 0) & (there > 0)
+            pairs.append(np.column_stack((here[touching] - 1 + offset, there[touching] - 1 + neighbor_offset)))
+    pairs = np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+    nb_parts = int(offsets[-1])
+    adjacency = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(nb_parts, nb_parts))
+    nb_zones, zones = connected_components(adjacency, directed=False)
+
+    def per_zone(key):
+        return np.bincount(zones, weights=np.concatenate([tile[key][1:] for tile in tiles]), minlength=nb_zones)
+
+    nb_eroded, nb_pixels = per_zone("nb_eroded"), per_zone("nb_pixels")
+    sum_x, sum_y, population = per_zone("sum_x"), per_zone("sum_y"), per_zone("population")
+    first_pixel = np.full(nb_zones, np.iinfo(np.int64).max)
+    np.minimum.at(first_pixel, zones, np.concatenate([tile["first_pixel"][1:] for tile in tiles]))
+
+    kept = np.flatnonzero(nb_eroded)
+    kept = kept[np.argsort(first_pixel[kept], kind="stable")]
+    hotspots = pd.DataFrame({
+        "x": sum_x[kept] / nb_eroded[kept],
+        "y": sum_y[kept] / nb_eroded[kept],
+        "population": np.round(population[kept], 0),
+        "nb_pixels": nb_pixels[kept].astype(np.int64),
+        "area_km2": nb_pixels[kept] * pixel_size ** 2 / 1e6,
+        "nb_pixels_eroded": nb_eroded[kept].astype(np.int64),
+    })
+    hotspots = hotspots.sort_values("population", ascending=False, kind="stable").reset_index(drop=True)
+    hotspots.insert(0, "rank", np.arange(1, len(hotspots) + 1))
+    return hotspots[HOTSPOT_COLUMNS]
+
+
+def missing_coverage_hotspots(read_window, windows, transform, width, height, erosion_radius, population_points):
+    """Zones peuplées non couvertes, classées par population, sans passer par des géométries.
+
+    Équivalent raster de shapes() + buffer(-erosion_radius) + centroid : les zones sont les
+    composantes 4-connexes du raster seuillé (comme shapes) ; un pixel survit à l'érosion si son
+    centre est à au moins erosion_radius du bord de sa zone (transformée de distance) ; une zone
+    est retenue si au moins un pixel survit, et son point est le centroïde des pixels érodés.
+    La population est la somme des centroïdes Kontur tombant dans la zone (avant érosion).
+
+    Le raster est lu fenêtre par fenêtre (read_window, voir hotspot_tile) : seules les fenêtres
+    données sont étiquetées, le reste de la grille est considéré comme couvert. La mémoire est
+    celle d'une fenêtre élargie du halo d'érosion, plus les labels de bord.
+    """
+    tiles = [hotspot_tile(read_window, window, transform, width, height, erosion_radius, population_points)
+             for window in windows]
+    return merge_hotspot_tiles(tiles, transform)
+
+
+def adaptive_coverage_window(population_points, sub_xs, sub_ys, tree, transform, width, height, country_mask,
+                             kernel_radius, coverage_radius, population_threshold,
+                             coarse_factor=ADAPTIVE_COARSE_FACTOR, refine_block=ADAPTIVE_REFINE_BLOCK):
+    """Seuil population et zones non couvertes d'une fenêtre, évalués d'abord sur une grille grossière.
+
+    Heatmap et distance exacte aux substations sont calculées au centre de chaque pixel grossier
+    (coarse_factor x coarse_factor pixels fins), à au plus une demi-diagonale δ de leurs pixels fins.
+    Le noyau v (1 - d²/r²) est (2 v / r)-lipschitzien : la chaleur des pixels fins est à moins de
+    2 δ M / r de celle du centre, M étant la population à moins de r + δ du centre (majorée sur la
+    grille grossière, voir mass_within). Un pixel grossier est tranché sans calcul fin si sa chaleur
+    est sous le seuil de plus de cette borne, ou au-dessus avec une distance à plus de δ du rayon de
+    couverture (la distance étant 1-lipschitzienne). Les deux tests sont des bornes : le résultat est
+    celui de la pleine résolution, aux arrondis de la FFT près. Les pixels fins du pays dans les
+    pixels grossiers ambigus sont évalués exactement : heatmap fine sur les seuls blocs de refine_block pixels qui en
+    contiennent (points à moins d'un rayon de noyau du bloc, anneau de bord restreint aux points
+    proches des pixels à évaluer), distance par requête dans tree.
+    Retourne (seuil population, seuil non couvert) découpés par country_mask, et le nombre de
+    pixels fins évalués.
+    """
+    pixel_size = transform.a
+    coarse_width, coarse_height = -(-width // coarse_factor), -(-height // coarse_factor)
+    coarse_transform = transform * Affine.scale(coarse_factor)
+    xs, ys, values = points_near_window(population_points, transform, width, height, kernel_radius)
+    coarse_heat = heatmap_from_arrays(xs, ys, values, coarse_transform, coarse_width, coarse_height, kernel_radius)
+
+    delta = (coarse_factor - 1) / 2 * pixel_size * math.sqrt(2)
+    coarse_distance = np.full((coarse_height, coarse_width), np.inf)
+    if tree is not None:
+        cx = coarse_transform.c + (np.arange(coarse_width) + 0.5) * coarse_transform.a
+        cy = coarse_transform.f + (np.arange(coarse_height) + 0.5) * coarse_transform.e
+        grid_x, grid_y = np.meshgrid(cx, cy)
+        coarse_distance, _ = tree.query(np.column_stack((grid_x.ravel(), grid_y.ravel())),
+                                        distance_upper_bound=coverage_radius + 2 * delta)
+        coarse_distance = coarse_distance.reshape(coarse_height, coarse_width)
+
+    # écart maximal entre la chaleur d'un pixel fin et celle du centre de son pixel grossier,
+    # plus le bruit de la FFT (1e-5 de la valeur maximale, voir heatmap_from_arrays)
+    heat_bound = 2 * delta / kernel_radius * mass_within(xs, ys, values, coarse_transform, coarse_width,
+                                                         coarse_height, kernel_radius + delta)
+    heat_bound += 1e-5 * max(float(coarse_heat.max()), population_threshold)
+    populated = coarse_heat - heat_bound > population_threshold
+    empty = coarse_heat + heat_bound <= population_threshold
+    far = coarse_distance > coverage_radius + delta
+    near = coarse_distance <= coverage_radius - delta
+    ambiguous = ~empty & ~(populated & (far | near))
+
+    def upsample(coarse):
+        return np.repeat(np.repeat(coarse, coarse_factor, axis=0), coarse_factor, axis=1)[:height, :width]
+
+    raster_population_threshold = upsample(populated)
+    raster_uncovered = upsample(far)
+
+    refine = upsample(ambiguous) & (country_mask > 0)
+    for block in iter_windows(width, height, refine_block):
+        block_slices = block.toslices()
+        block_refine = refine[block_slices]
+        if not block_refine.any():
             continue
-        cell_coords = grid_points[idxs]
-        dists = np.sqrt((cell_coords[:, 0] - px) ** 2 + (cell_coords[:, 1] - py) ** 2)
-        # modèle quadratique : w = nb * (1 - (d/r)^2) pour d <= r
-        weights = nb * (1.0 - (dists / r) ** 2)
-        # contributions
-        heat[idxs] += weights
-
-    heatmap = heat.reshape((height, width))
-    return heatmap.astype(np.float32)
-
-
-def rasterize_substation_buffer(substations_gdf, pixel_size, bounds, transform, width, height, buffer_distance):
-    # buffer_distance en mètres (50 km = 50000 m)
-    # create buffers in metric CRS
-    buffers = substations_gdf.geometry.buffer(buffer_distance)
-    # fusionner et dissoudre
-    if len(buffers) == 0:
-        merged = None
-    else:
-        merged = unary_union(buffers)
-    # rasterize : fill=1 partout sauf brûler 0 pour le buffer
-    if merged is None or merged.is_empty:
-        # no buffers: all ones
-        arr = np.ones((height, width), dtype=np.uint8)
-    else:
-        shapes = [ (mapping(merged), 0) ]
-        arr = rasterize(
-            shapes,
-            out_shape=(height, width),
-            transform=transform,
-            fill=1,
-            dtype=np.uint8,
-        )
-    return arr
+        block_transform = window_transform(block, transform)
+        block_width, block_height = int(block.width), int(block.height)
+        block_points = points_near_window((xs, ys, values), block_transform, block_width, block_height, kernel_radius)
+        heat = heatmap_from_arrays(*block_points, block_transform, block_width, block_height, kernel_radius,
+                                   exact_mask=block_refine)
+        raster_population_threshold[block_slices][block_refine] = heat[block_refine] > population_threshold
+    rows, cols = np.nonzero(refine)
+    if len(rows):
+        px = transform.c + (cols + 0.5) * pixel_size
+        py = transform.f - (rows + 0.5) * pixel_size
+        if tree is None:
+            raster_uncovered[rows, cols] = True
+        else:
+            distance, _ = tree.query(np.column_stack((px, py)), distance_upper_bound=coverage_radius * (1 + 1e-9))
+            raster_uncovered[rows, cols] = distance > coverage_radius
+
+    raster_population_threshold = clip_raster_by_country(raster_population_threshold.astype(np.uint8), country_mask)
+    raster_threshold = raster_population_threshold * raster_uncovered.astype(np.uint8)
+    return raster_population_threshold, raster_threshold, len(rows)
+
+
+def mass_within(xs, ys, values, transform, width, height, radius):
+    """Majorant de la somme des values des points à moins de radius du centre de chaque pixel.
+
+    Les points sont agrégés par pixel ; un pixel compte en entier si son centre est à moins de
+    radius + une demi-diagonale du centre considéré (tout point du pixel peut être à moins de radius).
+    """
+    pixel_size = transform.a
+    reach = radius + pixel_size * math.sqrt(2) / 2
+    pad = int(math.ceil(reach / pixel_size))
+    cols = np.floor((xs - transform.c) / pixel_size).astype(np.int64) + pad
+    rows = np.floor((transform.f - ys) / pixel_size).astype(np.int64) + pad
+    padded_shape = (height + 2 * pad, width + 2 * pad)
+    keep = (cols >= 0) & (cols < padded_shape[1]) & (rows >= 0) & (rows < padded_shape[0])
+    grid = np.bincount(rows[keep] * padded_shape[1] + cols[keep], weights=np.abs(values[keep]),
+                       minlength=padded_shape[0] * padded_shape[1]).reshape(padded_shape)
+    di, dj = np.meshgrid(np.arange(-pad, pad + 1), np.arange(-pad, pad + 1), indexing="ij")
+    disk = ((di ** 2 + dj ** 2) * pixel_size ** 2 <= reach ** 2).astype(np.float64)
+    # bruit de la FFT : négligeable devant la somme totale, ajoutée en marge
+    return np.maximum(convolve(grid, disk, mode="valid"), 0) + 1e-9 * grid.sum()
+
+
+def sweep_counts(heatmap, distance, country_mask, coverage_radii, thresholds):
+    """Pour chaque seuil : nombre de pixels du pays au-dessus du seuil, et pour chaque rayon
+    (triés) : nombre de ces pixels à plus de rayon de toute substation. Une seule passe de tri
+    des distances par seuil, les rayons étant comptés par recherche dichotomique."""
+    in_country = country_mask.astype(bool)
+    pall = np.zeros(len(thresholds), dtype=np.int64)
+    pth = np.zeros((len(coverage_radii), len(thresholds)), dtype=np.int64)
+    for j, threshold in enumerate(thresholds):
+        populated = in_country & (heatmap > threshold)
+        dists = np.sort(distance[populated])
+        pall[j] = dists.size
+        pth[:, j] = dists.size - np.searchsorted(dists, coverage_radii, side="right")
+    return pall, pth
+
+
+def substation_distance(xs, ys, transform, width, height, max_distance, tree=None, exact_radii=None):
+    """Distance (m, float32) du centre de chaque pixel à la substation la plus proche.
+
+    Les substations sont posées sur une grille élargie d'un halo de max_distance, puis une
+    transformée de distance euclidienne (EDT) donne pour chaque pixel le pixel-substation le plus
+    proche ; la distance est ensuite mesurée jusqu'à la position réelle de cette substation. Elle
+    majore la distance exacte d'au plus s·√2 (plusieurs substations dans un même pixel, ou pixel
+    voisin plus proche que celui de la substation la plus proche).
+    Pour chaque rayon de exact_radii (par défaut max_distance), les pixels de la bande ambiguë
+    ]rayon, rayon + s·√2] sont recalculés exactement avec tree (cKDTree des substations) : le seuil
+    distance <= rayon est alors exact. Au-delà de max_distance la distance vaut inf.
+    """
+    pixel_size = transform.a
+    tolerance = pixel_size * math.sqrt(2)
+    distance = np.full((height, width), np.inf, dtype=np.float32)
+    if len(xs) == 0:
+        return distance
+    exact_radii = [max_distance] if exact_radii is None else exact_radii
+    halo = int(math.ceil((max_distance + tolerance) / pixel_size)) + 1
+    ext_shape = (height + 2 * halo, width + 2 * halo)
+    cols = np.floor((xs - transform.c) / pixel_size).astype(np.int64) + halo
+    rows = np.floor((transform.f - ys) / pixel_size).astype(np.int64) + halo
+    keep = (cols >= 0) & (cols < ext_shape[1]) & (rows >= 0) & (rows < ext_shape[0])
+    if not keep.any():
+        return distance
+    seeds = np.full(ext_shape, -1, dtype=np.int64)
+    seeds[rows[keep], cols[keep]] = np.flatnonzero(keep)
+    ind_rows, ind_cols = distance_transform_edt(seeds < 0, return_distances=False, return_indices=True)
+    inner = (slice(halo, halo + height), slice(halo, halo + width))
+    nearest = seeds[ind_rows[inner], ind_cols[inner]]
+    del ind_rows, ind_cols, seeds
+
+    cx = transform.c + (np.arange(width) + 0.5) * pixel_size
+    cy = transform.f - (np.arange(height) + 0.5) * pixel_size
+    distance = np.hypot(cx[np.newaxis, :] - xs[nearest], cy[:, np.newaxis] - ys[nearest]).astype(np.float32)
+
+    if tree is not None:
+        for radius in exact_radii:
+            band = (distance > radius) & (distance <= radius + tolerance)
+            if band.any():
+                band_rows, band_cols = np.nonzero(band)
+                exact, _ = tree.query(np.column_stack((cx[band_cols], cy[band_rows])))
+                distance[band_rows, band_cols] = exact
+    distance[distance > max_distance + tolerance] = np.inf
+    return distance
 
 
 def save_raster(path, array, transform, crs, dtype=rasterio.float32, nodata=None):
@@ -260,8 +1121,49 @@ def save_raster(path, array, transform, crs, dtype=rasterio.float32, nodata=None
         dst.write(array.astype(dtype), 1)
 
 
+def open_tiled_raster(path, width, height, transform, crs, dtype=rasterio.float32, nodata=None, tile_size=256):
+    """Ouvre en écriture un GeoTIFF tuilé, à remplir fenêtre par fenêtre."""
+    return rasterio.open(
+        path,
+        'w',
+        driver='GTiff',
+        height=height,
+        width=width,
+        count=1,
+        dtype=dtype,
+        crs=crs,
+        transform=transform,
+        nodata=nodata,
+        compress='lzw',
+        tiled=True,
+        blockxsize=tile_size,
+        blockysize=tile_size,
+        BIGTIFF='IF_SAFER',
+        SPARSE_OK='TRUE',
+    )
+
+
 if __name__ == '__main__':
-    main("IN")
+    parser = argparse.ArgumentParser(description="Population coverage by substations")
+    parser.add_argument("countries", nargs="*", default=["IN"], help="ISO2 country codes")
+    parser.add_argument("--block-size", type=int, default=None,
+                        help="Process the grid by windows of N x N pixels (tiled mode for large countries)")
+    parser.add_argument("--sparse", action="store_true",
+                        help="Only compute windows near land (archipelagos, overseas territories)")
+    parser.add_argument("--coverage-radii", type=float, nargs="+", default=None,
+                        help="Sweep: substation coverage radii in metres")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=None,
+                        help="Sweep: population heatmap thresholds")
+    parser.add_argument("--threads", type=int, default=1, help="Threads for the heatmap and country mask")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Coarse evaluation, refined only near the population threshold or a coverage boundary")
+    parser.add_argument("--vector", action="store_true",
+                        help="Exact population-weighted coverage from centroid distances, no raster")
+    args = parser.parse_args()
+    for country_code in args.countries:
+        main(country_code, block_size=args.block_size, sparse=args.sparse,
+             coverage_radii=args.coverage_radii, thresholds=args.thresholds, n_threads=args.threads,
+             adaptive=args.adaptive, vector=args.vector)
     """for key, val in config.WORLD_COUNTRY_DICT.items():
         print(f"-------- {val} ({key}) -------")
         main(key)"""
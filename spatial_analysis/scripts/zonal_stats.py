@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Statistiques de couverture par polygone (régions, districts, tout GeoPackage) à partir des rasters
+d'un pays produits par script_production.py.
+
+Les rasters sont lus par fenêtres ; dans chaque fenêtre, les polygones qui la recoupent sont
+rasterisés une seule fois en étiquettes (indice du polygone + 1) et toutes les statistiques sont
+des bincount sur ces étiquettes : une passe pour tous les polygones, quel que soit leur nombre.
+Un pixel appartient au polygone dont il contient le centre ; si plusieurs polygones se
+chevauchent, au dernier de la couche.
+
+Statistiques par polygone :
+    nb_pixels              pixels dans le polygone
+    nb_pixels_populated    pixels peuplés du pays (raster_population_threshold.tif)
+    nb_pixels_not_covered  pixels peuplés hors couverture (out_coverage_threshold.tif)
+    coverage_population    100 x (1 - non couverts / peuplés), vide sans pixel peuplé
+    heat_not_covered       somme de la heatmap hors couverture (out_coverage_brut.tif, si présent)
+
+Un pays avec des parties lointaines (outre-mer) a une grille par région
+(script_production.region_coverage, rasters <nom>_region<k>.tif) : chaque polygone est reprojeté
+dans la grille de chaque région et ses pixels des différentes régions sont additionnés.
+
+out_coverage_brut.tif n'est produit que par un run pleine résolution : si stats_coverage.json
+indique un run adaptatif, un tel fichier est celui d'un run antérieur et zonal_coverage lève
+une ValueError au lieu de le lire.
+
+Usage:
+    python zonal_stats.py FR ../data/FR/admin1.gpkg --id-field name
+    python zonal_stats.py IN districts.gpkg --layer districts --output ../build/IN/zonal_districts.csv
+"""
+
+import argparse
+import json
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio
+import shapely
+from rasterio.features import rasterize
+from rasterio.windows import bounds as window_bounds
+from rasterio.windows import transform as window_transform
+from shapely.geometry import box
+
+import script_production
+
+ZONAL_BLOCK_SIZE = 2048
+
+
+def check_coverage_brut(coverage_brut_file, stats_coverage_file):
+    """ValueError si out_coverage_brut.tif ne vient pas du dernier run (adaptatif, voir script_production.main)."""
+    if not coverage_brut_file.is_file() or not stats_coverage_file.is_file():
+        return
+    with open(stats_coverage_file, encoding="utf-8") as f:
+        mode = json.load(f).get("mode", "full")
+    if mode != "full":
+        raise ValueError(f"{coverage_brut_file} is stale: the last run was {mode} "
+                         f"({stats_coverage_file}); rerun script_production.py without --adaptive")
+
+
+def zonal_coverage(country_code, polygons, id_field=None, block_size=ZONAL_BLOCK_SIZE):
+    """Statistiques de couverture de chaque polygone (GeoDataFrame ou chemin d'une couche vecteur).
+
+    Retourne un DataFrame, une ligne par polygone dans l'ordre de la couche (id_field, ou l'index).
+    """
+    stats_coverage_file = script_production.BUILD_PATH / f"{country_code}/stats_coverage.json"
+    if not isinstance(polygons, gpd.GeoDataFrame):
+        polygons = gpd.read_file(polygons)
+    nb_labels = len(polygons) + 1
+    nb_pixels = np.zeros(nb_labels, dtype=np.int64)
+    nb_populated = np.zeros(nb_labels, dtype=np.int64)
+    nb_not_covered = np.zeros(nb_labels, dtype=np.int64)
+    heat_not_covered = np.zeros(nb_labels, dtype=np.float64)
+    has_brut = False
+
+    # une grille par région du pays (script_production.region_coverage) ; les régions sont assez
+    # éloignées pour qu'un pixel ne soit compté que dans une seule
+    for region in range(max(1, len(script_production.region_files(country_code, "raster_population_threshold.tif")))):
+        population_threshold_file = script_production.region_file(country_code, "raster_population_threshold.tif",
+                                                                  region)
+        coverage_threshold_file = script_production.region_file(country_code, "out_coverage_threshold.tif", region)
+        coverage_brut_file = script_production.region_file(country_code, "out_coverage_brut.tif", region)
+        check_coverage_brut(coverage_brut_file, stats_coverage_file)
+        with rasterio.open(population_threshold_file) as src_population, \
+                rasterio.open(coverage_threshold_file) as src_threshold:
+            src_brut = rasterio.open(coverage_brut_file) if coverage_brut_file.is_file() else None
+            has_brut = has_brut or src_brut is not None
+            geometries = polygons.to_crs(src_population.crs).geometry.values
+            tree = shapely.STRtree(geometries)
+
+            for window in script_production.iter_windows(src_population.width, src_population.height, block_size):
+                indices = tree.query(box(*window_bounds(window, src_population.transform)), predicate="intersects")
+                if not len(indices):
+                    continue
+                height, width = int(window.height), int(window.width)
+                labels = rasterize([(geometries[i], int(i) + 1) for i in np.sort(indices)], out_shape=(height, width),
+                                   transform=window_transform(window, src_population.transform), fill=0,
+                                   dtype=np.uint32).ravel()
+                inside = labels > 0
+                if not inside.any():
+                    continue
+                labels = labels[inside]
+                nb_pixels += np.bincount(labels, minlength=nb_labels)
+                populated = src_population.read(1, window=window).ravel()[inside]
+                nb_populated += np.bincount(labels, weights=populated, minlength=nb_labels).astype(np.int64)
+                not_covered = src_threshold.read(1, window=window).ravel()[inside]
+                nb_not_covered += np.bincount(labels, weights=not_covered, minlength=nb_labels).astype(np.int64)
+                if src_brut is not None:
+                    heat = src_brut.read(1, window=window).ravel()[inside]
+                    heat_not_covered += np.bincount(labels, weights=heat, minlength=nb_labels)
+            if src_brut is not None:
+                src_brut.close()
+
+    df = pd.DataFrame({
+        id_field or "polygon": polygons[id_field].to_numpy() if id_field else polygons.index.to_numpy(),
+        "nb_pixels": nb_pixels[1:],
+        "nb_pixels_populated": nb_populated[1:],
+        "nb_pixels_not_covered": nb_not_covered[1:],
+    })
+    df["coverage_population"] = [float(round((1 - t / a) * 100, 1)) if a else None
+                                 for a, t in zip(df["nb_pixels_populated"], df["nb_pixels_not_covered"])]
+    if has_brut:
+        df["heat_not_covered"] = heat_not_covered[1:].round(1)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coverage statistics per polygon from a country's build rasters")
+    parser.add_argument("country", help="ISO2 country code (rasters in ../build/<country>/)")
+    parser.add_argument("polygons", help="Polygon layer (GeoPackage, shapefile...)")
+    parser.add_argument("--layer", default=None)
+    parser.add_argument("--id-field", default=None, help="Polygon identifier column (default: row number)")
+    parser.add_argument("--output", default=None, help="CSV file (default: ../build/<country>/zonal_coverage.csv)")
+    parser.add_argument("--block-size", type=int, default=ZONAL_BLOCK_SIZE)
+    args = parser.parse_args()
+    layer = gpd.read_file(args.polygons, layer=args.layer) if args.layer else gpd.read_file(args.polygons)
+    result = zonal_coverage(args.country, layer, id_field=args.id_field, block_size=args.block_size)
+    output = args.output or script_production.BUILD_PATH / f"{args.country}/zonal_coverage.csv"
+    result.to_csv(output, index=False)
+    print(result.head(20))
+    print(f" * {len(result)} polygons, saved to {output}")
@@ -0,0 +1,68 @@
+"""
+Mode adaptatif (script_production.adaptive_coverage_window) contre le calcul pleine résolution.
+
+Fixture synthétique : villes en amas dont la population est choisie pour que la heatmap passe
+autour du seuil, substations aléatoires. Lancer depuis la racine : python -m pytest spatial_analysis/tests
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from rasterio.transform import from_origin
+from scipy.spatial import cKDTree
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+import script_production  # noqa: E402
+
+PIXEL_SIZE = 2000.0
+KERNEL_RADIUS = 15000.0
+COVERAGE_RADIUS = 40000.0
+THRESHOLD = 10000.0
+
+
+def clustered_towns(seed, width, height, nb_towns=40, nb_points=60000):
+    """Points population en amas ; chaque ville a un pic de chaleur tiré entre 0,5 et 2 fois le seuil."""
+    rng = np.random.default_rng(seed)
+    town_x = rng.uniform(0, width * PIXEL_SIZE, nb_towns)
+    town_y = rng.uniform(0, height * PIXEL_SIZE, nb_towns)
+    town = rng.integers(0, nb_towns, nb_points)
+    spread = rng.uniform(3000, 15000, nb_towns)[town]
+    xs = town_x[town] + rng.normal(0, 1, nb_points) * spread
+    ys = town_y[town] + rng.normal(0, 1, nb_points) * spread
+    # pic d'une ville ~ population / (π r² / 2) x aire d'un pixel ; réglé autour du seuil
+    weight = rng.uniform(0.5, 2.0, nb_towns)[town] * THRESHOLD * (spread / PIXEL_SIZE) ** 2 \
+        / np.bincount(town, minlength=nb_towns)[town] * 2.5
+    values = weight * rng.uniform(0.5, 1.5, nb_points)
+    substations = np.column_stack((rng.uniform(0, width * PIXEL_SIZE, 60), rng.uniform(0, height * PIXEL_SIZE, 60)))
+    return script_production.sort_points_by_y(xs, ys, values), substations
+
+
+def coverage(populated, not_covered):
+    return 100 * (1 - not_covered.sum() / populated.sum())
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_adaptive_matches_full_resolution(seed):
+    width, height = 300, 220
+    transform = from_origin(0, height * PIXEL_SIZE, PIXEL_SIZE, PIXEL_SIZE)
+    points, substations = clustered_towns(seed, width, height)
+    country_mask = np.zeros((height, width), dtype=np.uint8)
+    country_mask[10:-10, 10:-10] = 1
+    tree = cKDTree(substations)
+
+    heat = script_production.heatmap_from_arrays(*points, transform, width, height, KERNEL_RADIUS)
+    distance = script_production.substation_distance(substations[:, 0], substations[:, 1], transform, width, height,
+                                                     COVERAGE_RADIUS, tree=tree, exact_radii=[COVERAGE_RADIUS])
+    full_populated = (heat > THRESHOLD) & (country_mask > 0)
+    full_not_covered = full_populated & (distance > COVERAGE_RADIUS)
+    assert full_populated.sum() > 1000
+
+    populated, not_covered, _ = script_production.adaptive_coverage_window(
+        points, substations[:, 0], substations[:, 1], tree, transform, width, height, country_mask,
+        KERNEL_RADIUS, COVERAGE_RADIUS, THRESHOLD)
+    gap = abs(coverage(populated > 0, not_covered > 0) - coverage(full_populated, full_not_covered))
+    assert gap <= script_production.ADAPTIVE_TOLERANCE
+    # les tests grossiers sont des bornes : seuls des pixels à l'arrondi de la FFT près du seuil peuvent différer
+    assert ((populated > 0) != full_populated).sum() <= 2